@@ -2,44 +2,62 @@
 """
 Debug script to test CBS.log file collection directly
 """
-import asyncio
+import argparse
+import logging
 import os
 import sys
+from typing import List
 sys.path.append('src')
 
+from loggatheringagent.core.event_loop import run
 from loggatheringagent.mcp_clients.direct_local_client import DirectLocalClient
 
-async def test_cbs_collection():
-    """Test CBS.log collection directly"""
-    print("=== Testing CBS.log Collection ===")
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATHS = ["C$/Windows/Logs/CBS/CBS.log"]
+
+async def test_cbs_collection(paths: List[str], lines: int = 50):
+    """Test CBS.log collection directly, reusing one client for every path"""
+    logger.info("=== Testing CBS.log Collection ===")
     
     async with DirectLocalClient() as client:
-        # Test file existence check
-        print("1. Testing file existence check...")
-        exists_result = await client.check_file_exists(
-            hostname="localhost",
-            username="Administrator",
-            password="test",
-            file_path="C$/Windows/Logs/CBS/CBS.log"
-        )
-        print(f"File exists result: {exists_result}")
-        
-        # Test file reading
-        print("\n2. Testing file reading...")
-        read_result = await client.read_file_tail(
-            hostname="localhost",
-            username="Administrator", 
-            password="test",
-            file_path="C$/Windows/Logs/CBS/CBS.log",
-            lines=50
-        )
-        print(f"File read success: {read_result.get('success')}")
-        if read_result.get('success'):
-            print(f"Lines read: {read_result.get('lines_read')}")
-            print(f"Total lines: {read_result.get('total_lines')}")
-            print(f"Content preview: {read_result.get('content', '')[:200]}...")
-        else:
-            print(f"Error: {read_result.get('error')}")
+        for file_path in paths:
+            logger.info("--- %s ---", file_path)
+            
+            # Test file existence check
+            logger.info("1. Testing file existence check...")
+            exists_result = await client.check_file_exists(
+                hostname="localhost",
+                username="Administrator",
+                password="test",
+                file_path=file_path
+            )
+            logger.info("File exists result: %s", exists_result)
+            
+            # Test file reading
+            logger.info("2. Testing file reading...")
+            read_result = await client.read_file_tail(
+                hostname="localhost",
+                username="Administrator", 
+                password="test",
+                file_path=file_path,
+                lines=lines
+            )
+            logger.info("File read success: %s", read_result.get('success'))
+            if read_result.get('success'):
+                logger.info("Lines read: %s", read_result.get('lines_read'))
+                logger.info("File size: %s bytes", read_result.get('file_size'))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Content preview: %s...", read_result.get('content', '')[:200])
+            else:
+                logger.error("Error: %s", read_result.get('error'))
 
 if __name__ == "__main__":
-    asyncio.run(test_cbs_collection())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS,
+                        help="Files to read, in C$/... form (default: CBS.log)")
+    parser.add_argument("--lines", type=int, default=50, help="Lines to tail from each file")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run(test_cbs_collection(args.paths, args.lines))
@@ -2,59 +2,74 @@
 """
 Debug script to test full log collection pipeline
 """
+import argparse
 import asyncio
+import logging
 import os
 import sys
+from typing import List
 sys.path.append('src')
 
 from loggatheringagent.config.settings import Settings
+from loggatheringagent.core.event_loop import run
 from loggatheringagent.core.log_collector import WindowsLogCollector
 
-async def test_full_collection():
+logger = logging.getLogger(__name__)
+
+async def test_full_collection(client_names: List[str]):
     """Test complete log collection pipeline"""
-    print("=== Testing Full Log Collection Pipeline ===")
+    logger.info("=== Testing Full Log Collection Pipeline ===")
     
     # Initialize settings and collector
     settings = Settings()
     collector = WindowsLogCollector(settings)
     
     # Load machines config to see what's configured
-    print("1. Loading machines configuration...")
+    logger.info("1. Loading machines configuration...")
     config = settings.load_machines_config()
     
-    localhost_client = None
-    for client in config.clients:
-        if client.name == "LOCALHOST":
-            localhost_client = client
-            break
-    
-    if localhost_client:
-        print(f"Found LOCALHOST client: {localhost_client.hostname}")
-        print(f"Log paths configured: {localhost_client.log_paths}")
-        print(f"PowerShell commands: {len(localhost_client.powershell_commands)}")
-    else:
-        print("LOCALHOST client not found!")
-        return
+    configured = {client.name: client for client in config.clients}
+    if client_names == ["all"]:
+        client_names = list(configured)
     
-    # Test log collection
-    print("\n2. Testing log collection...")
-    log_collection = await collector.collect_client_logs("LOCALHOST")
+    for client_name in client_names:
+        client = configured.get(client_name)
+        if client:
+            logger.info("Found %s client: %s", client_name, client.hostname)
+            logger.info("Log paths configured: %s", client.log_paths)
+            logger.info("PowerShell commands: %d", len(client.powershell_commands))
+        else:
+            logger.error("%s client not found!", client_name)
+            return
     
-    print(f"Collection success: {log_collection.success}")
-    print(f"Number of log results: {len(log_collection.log_results)}")
-    print(f"Errors: {log_collection.errors}")
+    # Test log collection - one collector drives every client concurrently
+    logger.info("2. Testing log collection...")
+    log_collections = await asyncio.gather(
+        *[collector.collect_client_logs(client_name) for client_name in client_names]
+    )
     
-    print("\n3. Log results breakdown:")
-    for i, result in enumerate(log_collection.log_results):
-        print(f"  [{i+1}] {result.source}")
-        print(f"      Success: {result.success}")
-        print(f"      Lines: {result.lines_count}")
-        if result.error:
-            print(f"      Error: {result.error}")
-        if result.content:
-            preview = result.content[:100].replace('\n', ' ')
-            print(f"      Preview: {preview}...")
-        print()
+    for log_collection in log_collections:
+        logger.info("=== %s ===", log_collection.client_name)
+        logger.info("Collection success: %s", log_collection.success)
+        logger.info("Number of log results: %d", len(log_collection.log_results))
+        logger.info("Errors: %s", log_collection.errors)
+        
+        logger.info("3. Log results breakdown:")
+        for i, result in enumerate(log_collection.log_results):
+            logger.info("  [%d] %s", i + 1, result.source)
+            logger.info("      Success: %s", result.success)
+            logger.info("      Lines: %d", result.lines_count)
+            if result.error:
+                logger.info("      Error: %s", result.error)
+            if result.content and logger.isEnabledFor(logging.DEBUG):
+                preview = result.content[:100].replace('\n', ' ')
+                logger.debug("      Preview: %s...", preview)
 
 if __name__ == "__main__":
-    asyncio.run(test_full_collection())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", nargs="+", default=["LOCALHOST"],
+                        help="Client names to collect from, or 'all' (default: LOCALHOST)")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run(test_full_collection(args.clients))
@@ -5,9 +5,12 @@ Provides tools for executing PowerShell commands remotely via WinRM.
 """
 
 import asyncio
-import json
+import functools
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.types import (
@@ -17,10 +20,18 @@ from mcp.types import (
     Tool,
     TextContent,
 )
-import winrm
-from winrm.exceptions import WinRMError
+import orjson
+import requests
+from pypsrp.complex_objects import PSInvocationState
+from pypsrp.exceptions import InvalidRunspacePoolStateError, WinRMError
+from pypsrp.powershell import PowerShell, RunspacePool
+from pypsrp.wsman import WSMan
 import base64
 
+from loggatheringagent.core.event_loop import run
+from loggatheringagent.core.powershell_scripts import build_batch_item_command, build_event_log_command, build_windows_update_log_command
+from loggatheringagent.core.result_cache import CacheKey, CommandResultCache, VOLATILE_COMMAND_RE
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,63 +39,292 @@ logger = logging.getLogger(__name__)
 server = Server("powershell-mcp-server")
 
 
+def _dumps(obj: Any, indent: bool = True) -> str:
+    """Serialize a tool result to JSON text."""
+    option = orjson.OPT_INDENT_2 if indent else 0
+    return orjson.dumps(obj, option=option).decode('utf-8')
+
+
+# Output at least this many characters long is deflated before it crosses the wire
+COMPRESS_THRESHOLD = 16384
+DEFLATE_MARKER = "<<<LGA-DEFLATE>>>"
+
+# Renders a script's output as text and deflates it when it is large
+COMPRESSED_OUTPUT_WRAPPER = """
+$lgaText = & {
+{command}
+} | Out-String
+if ($lgaText.Length -ge %d) {
+    $lgaBytes = [Text.Encoding]::UTF8.GetBytes($lgaText)
+    $lgaStream = New-Object IO.MemoryStream
+    $lgaDeflate = New-Object IO.Compression.DeflateStream($lgaStream, [IO.Compression.CompressionLevel]::Fastest)
+    $lgaDeflate.Write($lgaBytes, 0, $lgaBytes.Length)
+    $lgaDeflate.Close()
+    '%s' + [Convert]::ToBase64String($lgaStream.ToArray())
+} else {
+    $lgaText
+}
+""" % (COMPRESS_THRESHOLD, DEFLATE_MARKER)
+
+# Errors that mean a cached runspace pool is unusable and should be recreated
+RECONNECT_ERRORS = (WinRMError, InvalidRunspacePoolStateError, requests.ConnectionError)
+
+# Seconds each receive may wait on the server; the session lock is released between receives
+RECEIVE_POLL_TIMEOUT = 1
+
+
 class PowerShellSession:
-    """Manages WinRM PowerShell sessions to remote Windows machines."""
+    """Manages persistent PowerShell runspace pools on remote Windows machines."""
+    
+    def __init__(self, cache_ttl: float = 30.0, max_runspaces: int = 8):
+        self.sessions: Dict[str, RunspacePool] = {}
+        self.result_cache = CommandResultCache(maxsize=512, ttl=cache_ttl)
+        self.max_runspaces = max_runspaces
+        # Commands run on worker threads; a lock per session key keeps concurrent calls
+        # from opening duplicate pools or interleaving messages on one connection. It is
+        # held per WSMan request, so pipelines on one host still run side by side
+        self._lock = threading.Lock()
+        self._session_locks: Dict[str, threading.RLock] = {}
     
-    def __init__(self):
-        self.sessions: Dict[str, winrm.Session] = {}
+    def _session_lock(self, session_key: str) -> threading.RLock:
+        """Return the lock guarding a session key."""
+        with self._lock:
+            return self._session_locks.setdefault(session_key, threading.RLock())
     
     def get_session(self, hostname: str, username: str, password: str, 
-                   transport: str = "ntlm") -> winrm.Session:
-        """Get or create a WinRM session to a remote machine."""
+                   transport: str = "ntlm") -> RunspacePool:
+        """Get or open a long-lived runspace pool on a remote machine."""
         session_key = f"{hostname}:{username}"
         
-        if session_key not in self.sessions:
+        with self._session_lock(session_key):
+            if session_key in self.sessions:
+                return self.sessions[session_key]
+            
             try:
-                session = winrm.Session(
-                    f"http://{hostname}:5985/wsman",
-                    auth=(username, password),
-                    transport=transport
+                wsman = WSMan(
+                    hostname,
+                    username=username,
+                    password=password,
+                    auth=transport,
+                    ssl=False,
+                    cert_validation=False
                 )
-                # Test the connection
-                result = session.run_ps("Write-Output 'Connection test'")
-                if result.status_code != 0:
-                    raise WinRMError(f"Connection test failed: {result.std_err}")
+                pool = RunspacePool(wsman, max_runspaces=self.max_runspaces)
+                # Opening the pool authenticates; the first real command surfaces anything else
+                pool.open()
                 
-                self.sessions[session_key] = session
-                logger.info(f"Created WinRM session to {hostname}")
+                self.sessions[session_key] = pool
+                logger.info("Opened PowerShell runspace pool on %s", hostname)
             except Exception as e:
-                logger.error(f"Failed to create session to {hostname}: {e}")
+                logger.error("Failed to create session to %s: %s", hostname, e)
                 raise
+            
+            return self.sessions[session_key]
+    
+    def _drop_session(self, session_key: str):
+        """Forget a cached runspace pool so the next call reconnects."""
+        with self._session_lock(session_key):
+            pool = self.sessions.pop(session_key, None)
+        if pool is not None:
+            try:
+                pool.close()
+            except Exception as e:
+                logger.debug("Ignoring error closing stale pool %s: %s", session_key, e)
+    
+    @staticmethod
+    def _submit(pool: RunspacePool, command: str) -> PowerShell:
+        """Start a PowerShell script in the runspace pool without waiting for it."""
+        ps = PowerShell(pool)
+        ps.add_script(COMPRESSED_OUTPUT_WRAPPER.replace("{command}", command, 1))
+        ps.begin_invoke()
+        return ps
+    
+    def _collect(self, session_key: str, ps: PowerShell) -> Tuple[str, str, int]:
+        """Wait for a submitted script and render its output as text."""
+        # Messages on one connection share NTLM sealing state, so each receive takes the
+        # session lock; other calls can submit or receive between polls
+        lock = self._session_lock(session_key)
+        while ps.state == PSInvocationState.RUNNING:
+            with lock:
+                ps.poll_invoke(timeout=RECEIVE_POLL_TIMEOUT)
+        output = ps.output
+        
+        std_out = "".join(str(item) for item in output if item is not None)
+        if std_out.startswith(DEFLATE_MARKER):
+            # Large output comes back as Base64 raw deflate; undo it here
+            compressed = base64.b64decode(std_out[len(DEFLATE_MARKER):].strip())
+            std_out = zlib.decompress(compressed, -15).decode('utf-8', errors='replace')
         
-        return self.sessions[session_key]
+        std_err = "\n".join(str(error) for error in ps.streams.error)
+        return std_out, std_err, 1 if ps.had_errors else 0
+    
+    def submit_batch(self, pool: RunspacePool, commands: List[str]) -> List[PowerShell]:
+        """Start every script before waiting on any, so they run side by side in the pool."""
+        return [self._submit(pool, command) for command in commands]
+    
+    def await_batch(self, session_key: str, pipelines: List[PowerShell]) -> List[Tuple[str, str, int]]:
+        """Collect the results of submitted scripts in submission order."""
+        results = []
+        for ps in pipelines:
+            try:
+                results.append(self._collect(session_key, ps))
+            except RECONNECT_ERRORS:
+                raise
+            except Exception as e:
+                results.append(("", str(e), -1))
+        return results
     
     def execute_command(self, hostname: str, username: str, password: str,
-                       command: str) -> Dict[str, Any]:
+                       command: str, no_cache: bool = False) -> Dict[str, Any]:
         """Execute a PowerShell command on a remote machine."""
+        cache_key = None
+        if not no_cache and not VOLATILE_COMMAND_RE.search(command):
+            cache_key = self.result_cache.make_key(hostname, username, password, command)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("cache_hit for command on %s", hostname)
+                return cached
+        
         try:
-            session = self.get_session(hostname, username, password)
-            result = session.run_ps(command)
+            session_key = f"{hostname}:{username}"
+            for attempt in range(2):
+                try:
+                    # Open and submit under the lock; collecting takes it once per receive
+                    with self._session_lock(session_key):
+                        pool = self.get_session(hostname, username, password)
+                        ps = self._submit(pool, command)
+                    std_out, std_err, status_code = self._collect(session_key, ps)
+                    break
+                except RECONNECT_ERRORS as e:
+                    # A cached pool may have gone stale; reconnect once and retry
+                    if attempt:
+                        raise
+                    logger.warning("Session to %s failed, reconnecting: %s", hostname, e)
+                    self._drop_session(session_key)
             
-            return {
-                "status_code": result.status_code,
-                "stdout": result.std_out.decode('utf-8', errors='replace'),
-                "stderr": result.std_err.decode('utf-8', errors='replace'),
-                "success": result.status_code == 0
+            result = {
+                "status_code": status_code,
+                "stdout": std_out,
+                "stderr": std_err,
+                "success": status_code == 0
             }
+            
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            
+            return result
         except Exception as e:
-            logger.error(f"Command execution failed: {e}")
+            logger.error("Command execution failed: %s", e)
             return {
                 "status_code": -1,
                 "stdout": "",
                 "stderr": str(e),
                 "success": False
             }
+    
+    def execute_batch(self, hostname: str, username: str, password: str,
+                      commands: List[str]) -> List[Dict[str, Any]]:
+        """Execute several PowerShell commands concurrently on one remote machine."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(commands)
+        cache_keys: Dict[int, CacheKey] = {}
+        pending = []
+        
+        for index, command in enumerate(commands):
+            if not VOLATILE_COMMAND_RE.search(command):
+                cache_keys[index] = self.result_cache.make_key(hostname, username, password, command)
+                cached = self.result_cache.get(cache_keys[index])
+                if cached is not None:
+                    logger.info("cache_hit for command on %s", hostname)
+                    results[index] = cached
+                    continue
+            pending.append(index)
+        
+        if not pending:
+            return results
+        
+        try:
+            session_key = f"{hostname}:{username}"
+            for attempt in range(2):
+                try:
+                    # Submit everything under the lock, then collect with one lock per receive
+                    with self._session_lock(session_key):
+                        pool = self.get_session(hostname, username, password)
+                        pipelines = self.submit_batch(pool, [commands[index] for index in pending])
+                    outputs = self.await_batch(session_key, pipelines)
+                    break
+                except RECONNECT_ERRORS as e:
+                    # A cached pool may have gone stale; reconnect once and retry
+                    if attempt:
+                        raise
+                    logger.warning("Session to %s failed, reconnecting: %s", hostname, e)
+                    self._drop_session(session_key)
+            
+            for index, (std_out, std_err, status_code) in zip(pending, outputs):
+                results[index] = {
+                    "status_code": status_code,
+                    "stdout": std_out,
+                    "stderr": std_err,
+                    "success": status_code == 0
+                }
+                if status_code != -1 and index in cache_keys:
+                    self.result_cache.put(cache_keys[index], results[index])
+        except Exception as e:
+            logger.error("Batch execution failed: %s", e)
+            for index in pending:
+                results[index] = {
+                    "status_code": -1,
+                    "stdout": "",
+                    "stderr": str(e),
+                    "success": False
+                }
+        
+        return results
+    
+    async def aclose(self):
+        """Close all open runspace pools."""
+        sessions = list(self.sessions.items())
+        self.sessions.clear()
+        for session_key, pool in sessions:
+            try:
+                await asyncio.to_thread(pool.close)
+            except Exception as e:
+                logger.warning("Failed to close runspace pool %s: %s", session_key, e)
 
 
 # Global PowerShell session manager
 ps_manager = PowerShellSession()
 
+# pypsrp is synchronous; run its calls on worker threads so tool calls overlap
+winrm_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="winrm")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the WinRM worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(winrm_executor, functools.partial(func, *args, **kwargs))
+
+
+def command_response(result: Dict[str, Any]) -> CallToolResult:
+    """Build a tool response as a small JSON header plus the raw stdout text."""
+    header = {
+        "status_code": result["status_code"],
+        "success": result["success"],
+        "stderr": result["stderr"]
+    }
+    
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=_dumps(header, indent=False)
+            ),
+            TextContent(
+                type="text",
+                text=result["stdout"]
+            )
+        ]
+    )
+
 
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
@@ -116,6 +356,11 @@ async def handle_list_tools() -> List[Tool]:
                         "type": "string",
                         "description": "WinRM transport (ntlm, kerberos, basic)",
                         "default": "ntlm"
+                    },
+                    "no_cache": {
+                        "type": "boolean",
+                        "description": "Bypass the short-lived result cache",
+                        "default": False
                     }
                 },
                 "required": ["hostname", "username", "password", "command"]
@@ -188,6 +433,46 @@ async def handle_list_tools() -> List[Tool]:
                 },
                 "required": ["hostname", "username", "password"]
             }
+        ),
+        Tool(
+            name="batch_execute",
+            description="Run several PowerShell tool requests concurrently on a remote machine over one runspace pool",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "hostname": {
+                        "type": "string",
+                        "description": "Target hostname or IP address"
+                    },
+                    "username": {
+                        "type": "string",
+                        "description": "Username for authentication"
+                    },
+                    "password": {
+                        "type": "string",
+                        "description": "Password for authentication"
+                    },
+                    "items": {
+                        "type": "array",
+                        "description": "Requests to run, each with a tool name and its arguments (without credentials)",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "tool": {
+                                    "type": "string",
+                                    "enum": ["execute_powershell", "get_windows_update_log", "get_event_log"],
+                                    "default": "execute_powershell"
+                                },
+                                "arguments": {
+                                    "type": "object"
+                                }
+                            },
+                            "required": ["arguments"]
+                        }
+                    }
+                },
+                "required": ["hostname", "username", "password", "items"]
+            }
         )
     ]
 
@@ -197,55 +482,30 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResu
     """Handle tool execution requests."""
     
     if name == "execute_powershell":
-        result = ps_manager.execute_command(
+        result = await run_blocking(
+            ps_manager.execute_command,
             hostname=arguments["hostname"],
             username=arguments["username"],
             password=arguments["password"],
-            command=arguments["command"]
+            command=arguments["command"],
+            no_cache=arguments.get("no_cache", False)
         )
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2)
-                )
-            ]
-        )
+        return command_response(result)
     
     elif name == "get_windows_update_log":
         output_path = arguments.get("output_path", "C:\\temp\\WindowsUpdate.log")
-        command = f"""
-        # Create temp directory if it doesn't exist
-        New-Item -ItemType Directory -Path C:\\temp -Force | Out-Null
-        
-        # Generate Windows Update log
-        Get-WindowsUpdateLog -LogPath "{output_path}"
+        command = build_windows_update_log_command(output_path)
         
-        # Read and return the last 1000 lines
-        if (Test-Path "{output_path}") {{
-            $content = Get-Content "{output_path}" -Tail 1000
-            $content -join "`n"
-        }} else {{
-            "Failed to generate Windows Update log"
-        }}
-        """
-        
-        result = ps_manager.execute_command(
+        result = await run_blocking(
+            ps_manager.execute_command,
             hostname=arguments["hostname"],
             username=arguments["username"],
             password=arguments["password"],
             command=command
         )
         
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2)
-                )
-            ]
-        )
+        return command_response(result)
     
     elif name == "get_event_log":
         log_name = arguments.get("log_name", "System")
@@ -254,35 +514,48 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResu
         source_filter = arguments.get("source_filter", "")
         
         # Build the PowerShell command
-        command = f"Get-WinEvent -LogName {log_name} -MaxEvents {max_events}"
-        
-        filters = []
-        if event_ids:
-            event_id_list = ",".join(map(str, event_ids))
-            filters.append(f"$_.Id -in @({event_id_list})")
+        command = build_event_log_command(log_name, max_events, event_ids, source_filter)
         
-        if source_filter:
-            filters.append(f"$_.ProviderName -like '{source_filter}'")
-        
-        if filters:
-            filter_string = " -and ".join(filters)
-            command += f" | Where-Object {{{filter_string}}}"
+        result = await run_blocking(
+            ps_manager.execute_command,
+            hostname=arguments["hostname"],
+            username=arguments["username"],
+            password=arguments["password"],
+            command=command
+        )
         
-        command += " | Select-Object TimeCreated, Id, LevelDisplayName, ProviderName, Message | ConvertTo-Json -Depth 3"
+        return command_response(result)
+    
+    elif name == "batch_execute":
+        items = arguments.get("items", [])
+        try:
+            commands = [build_batch_item_command(item) for item in items]
+        except (KeyError, ValueError) as e:
+            return CallToolResult(
+                content=[
+                    TextContent(
+                        type="text",
+                        text=f"Invalid batch item: {e}"
+                    )
+                ],
+                isError=True
+            )
         
-        result = ps_manager.execute_command(
+        item_results = await run_blocking(
+            ps_manager.execute_batch,
             hostname=arguments["hostname"],
             username=arguments["username"],
             password=arguments["password"],
-            command=command
+            commands=commands
         )
         
         return CallToolResult(
             content=[
                 TextContent(
                     type="text",
-                    text=json.dumps(result, indent=2)
+                    text=_dumps(item_result)
                 )
+                for item_result in item_results
             ]
         )
     
@@ -302,20 +575,25 @@ async def main():
     """Main entry point for the MCP server."""
     # Run the server using stdin/stdout streams
     from mcp.server.stdio import stdio_server
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream, 
-            write_stream, 
-            InitializationOptions(
-                server_name="powershell-mcp-server",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={}
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream, 
+                write_stream, 
+                InitializationOptions(
+                    server_name="powershell-mcp-server",
+                    server_version="1.0.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={}
+                    )
                 )
             )
-        )
+    finally:
+        # Shells live for the whole server process
+        await ps_manager.aclose()
+        winrm_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -4,12 +4,23 @@ FastMCP Server for remote PowerShell execution on Windows machines.
 Provides tools for executing PowerShell commands remotely via WinRM.
 """
 
+import atexit
+import base64
+import functools
 import logging
-from typing import Any, Dict, List, Optional
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 from fastmcp import FastMCP
 import subprocess
 import json
 
+from loggatheringagent.core.event_loop import run
+from loggatheringagent.core.powershell_scripts import build_event_log_command, build_windows_update_log_command
+from loggatheringagent.core.result_cache import CommandResultCache, VOLATILE_COMMAND_RE
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,28 +28,162 @@ logger = logging.getLogger(__name__)
 # Create FastMCP app
 mcp = FastMCP("PowerShell Execution Server")
 
+# Shared by all tools, since the log tools route through execute_powershell
+result_cache = CommandResultCache()
+
+
+@functools.lru_cache(maxsize=64)
+def _encode_command(command: str) -> str:
+    """Base64-encode a script as UTF-16LE, once per distinct script."""
+    return base64.b64encode(command.encode('utf-16-le')).decode('ascii')
+
+
+class _PersistentPwsh:
+    """A long-lived local powershell.exe fed one command at a time over stdin."""
+    
+    def __init__(self):
+        self.proc: Optional[subprocess.Popen] = None
+        self._stdout: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+    
+    def _start(self):
+        """Start the PowerShell child and its output reader threads."""
+        self._stdout = queue.Queue()
+        self._stderr = queue.Queue()
+        self.proc = subprocess.Popen(
+            ["powershell", "-NoLogo", "-NonInteractive", "-Command", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        for stream, lines in ((self.proc.stdout, self._stdout), (self.proc.stderr, self._stderr)):
+            threading.Thread(target=self._pump, args=(stream, lines), daemon=True).start()
+        
+        self._send("[Console]::OutputEncoding = [Text.Encoding]::UTF8; $OutputEncoding = [Text.Encoding]::UTF8")
+        logger.info(f"Started persistent PowerShell process (pid {self.proc.pid})")
+    
+    @staticmethod
+    def _pump(stream, lines: "queue.Queue[Optional[str]]"):
+        """Forward decoded lines from a pipe into a queue until EOF."""
+        for raw_line in iter(stream.readline, b""):
+            lines.put(raw_line.decode('utf-8', errors='replace'))
+        lines.put(None)
+    
+    def _send(self, line: str):
+        """Write a single line to the PowerShell stdin."""
+        self.proc.stdin.write(line.encode('utf-8') + b"\n")
+        self.proc.stdin.flush()
+    
+    def _read_until(self, lines: "queue.Queue[Optional[str]]", sentinel: str,
+                    deadline: float, timeout: float) -> Tuple[List[str], Optional[str]]:
+        """Collect lines until the sentinel line appears, returning it separately.
+        
+        The sentinel is None if the process exited first. TimeoutExpired is raised at the
+        deadline and reports timeout, the command's full time limit.
+        """
+        collected = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired("powershell", timeout)
+            try:
+                line = lines.get(timeout=remaining)
+            except queue.Empty:
+                raise subprocess.TimeoutExpired("powershell", timeout)
+            if line is None:
+                return collected, None
+            if line.startswith(sentinel):
+                return collected, line
+            collected.append(line)
+    
+    def run(self, command: str, timeout: float = 30) -> Tuple[int, str, str]:
+        """Run a command in the persistent process, returning (status, stdout, stderr).
+        
+        The command runs in a child scope, so its variables don't leak into later calls.
+        It fails if it raises, leaves records in $Error or sets a non-zero $LASTEXITCODE.
+        A command that calls exit ends the process; its exit code is returned as the
+        status and a fresh process is started for the next call.
+        """
+        with self._lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            
+            token = uuid.uuid4().hex
+            encoded = _encode_command(command)
+            # Everything goes on one line so that -Command - runs it immediately. $? is read
+            # inside the child scope, before Out-String replaces it
+            self._send(
+                f"$Error.Clear(); $global:LASTEXITCODE = 0; $global:lgaOk = $true; "
+                f"try {{ & {{ & ([ScriptBlock]::Create([Text.Encoding]::Unicode.GetString([Convert]::FromBase64String('{encoded}')))); "
+                f"$global:lgaOk = $? }} | Out-String -Stream -Width 4096 }} "
+                f"catch {{ [Console]::Error.WriteLine($_.Exception.Message); $global:lgaOk = $false }}; "
+                f"$lgaFailed = (-not $global:lgaOk) -or ($LASTEXITCODE -ne 0) -or ($Error.Count -gt 0); "
+                f"Write-Output \"<<<END {token} $([int]$lgaFailed)>>>\"; "
+                f"[Console]::Error.WriteLine('<<<END {token}>>>')"
+            )
+            
+            deadline = time.monotonic() + timeout
+            try:
+                stdout_lines, end_line = self._read_until(self._stdout, f"<<<END {token} ", deadline, timeout)
+                stderr_lines, _ = self._read_until(self._stderr, f"<<<END {token}>>>", deadline, timeout)
+                if end_line is None:
+                    # The command called exit; report its exit code like powershell -Command would
+                    status_code = self.proc.wait(timeout=max(deadline - time.monotonic(), 0.1))
+                    self.proc = None
+                    return status_code, "".join(stdout_lines), "".join(stderr_lines)
+            except Exception:
+                # The process is in an unknown state - start a fresh one next time
+                self.close()
+                raise
+            
+            status_code = int(end_line[len(f"<<<END {token} "):].split(">>>")[0])
+            return status_code, "".join(stdout_lines), "".join(stderr_lines)
+    
+    def close(self):
+        """Terminate the PowerShell process."""
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+
+# Local PowerShell process reused across tool calls
+_persistent = _PersistentPwsh()
+atexit.register(_persistent.close)
+
 
 @mcp.tool()
 def execute_powershell(hostname: str, username: str, password: str,
-                      command: str, transport: str = "ntlm") -> Dict[str, Any]:
+                      command: str, transport: str = "ntlm",
+                      no_cache: bool = False) -> Dict[str, Any]:
     """Execute a PowerShell command on a remote Windows machine via WinRM."""
+    cache_key = None
+    if not no_cache and not VOLATILE_COMMAND_RE.search(command):
+        cache_key = result_cache.make_key(hostname, username, password, command)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"cache_hit for command on {hostname}")
+            return cached
+    
     try:
         # For localhost testing, execute locally
         if hostname in ['localhost', '127.0.0.1']:
-            # Execute PowerShell command locally
-            result = subprocess.run(
-                ["powershell", "-Command", command],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            # Execute PowerShell command in the persistent local process
+            status_code, stdout, stderr = _persistent.run(command, timeout=30)
             
-            return {
-                "status_code": result.returncode,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "success": result.returncode == 0
+            output = {
+                "status_code": status_code,
+                "stdout": stdout,
+                "stderr": stderr,
+                "success": status_code == 0
             }
+            
+            if cache_key is not None:
+                result_cache.put(cache_key, output)
+            
+            return output
         else:
             return {
                 "status_code": -1,
@@ -61,21 +206,7 @@ def execute_powershell(hostname: str, username: str, password: str,
 def get_windows_update_log(hostname: str, username: str, password: str,
                           output_path: str = "C:\\temp\\WindowsUpdate.log") -> Dict[str, Any]:
     """Get Windows Update log from remote machine using Get-WindowsUpdateLog cmdlet."""
-    command = f"""
-    # Create temp directory if it doesn't exist
-    New-Item -ItemType Directory -Path C:\\temp -Force | Out-Null
-    
-    # Generate Windows Update log
-    Get-WindowsUpdateLog -LogPath "{output_path}"
-    
-    # Read and return the last 1000 lines
-    if (Test-Path "{output_path}") {{
-        $content = Get-Content "{output_path}" -Tail 1000
-        $content -join "`n"
-    }} else {{
-        "Failed to generate Windows Update log"
-    }}
-    """
+    command = build_windows_update_log_command(output_path)
     
     return execute_powershell(hostname, username, password, command)
 
@@ -87,24 +218,10 @@ def get_event_log(hostname: str, username: str, password: str,
                  source_filter: Optional[str] = None) -> Dict[str, Any]:
     """Query Windows Event Log from remote machine."""
     # Build the PowerShell command
-    command = f"Get-WinEvent -LogName {log_name} -MaxEvents {max_events}"
-    
-    filters = []
-    if event_ids:
-        event_id_list = ",".join(map(str, event_ids))
-        filters.append(f"$_.Id -in @({event_id_list})")
-    
-    if source_filter:
-        filters.append(f"$_.ProviderName -like '{source_filter}'")
-    
-    if filters:
-        filter_string = " -and ".join(filters)
-        command += f" | Where-Object {{{filter_string}}}"
-    
-    command += " | Select-Object TimeCreated, Id, LevelDisplayName, ProviderName, Message | ConvertTo-Json -Depth 3"
+    command = build_event_log_command(log_name, max_events, event_ids, source_filter)
     
     return execute_powershell(hostname, username, password, command)
 
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run(mcp.run_async())
\ No newline at end of file
@@ -5,70 +5,77 @@ Provides tools for reading log files via SMB shares.
 """
 
 import asyncio
-import json
+import base64
 import logging
-import tempfile
-from typing import Any, Dict, List, Optional
-from pathlib import Path
+from typing import Any, Dict, List
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
-from mcp.types import (
-    CallToolRequest,
-    CallToolResult,
-    ListToolsRequest,
-    Tool,
-    TextContent,
-)
+from mcp.types import CallToolResult, Tool, TextContent
 import os
 import stat as os_stat
 
+import orjson
+
+from loggatheringagent.core.local_files import (
+    LOCAL_HOSTS,
+    count_lines,
+    directory_columns,
+    drop_cached_pages,
+    get_cached_stat,
+    invalidate_cached_stat,
+    open_log,
+    read_tail,
+    scan_directory,
+    store_cached_stat,
+    to_local,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _dumps(obj: Any) -> str:
+    """Serialize a tool result to compact JSON text."""
+    return orjson.dumps(obj).decode('utf-8')
+
+
+# File tails larger than this are sent base64-encoded instead of decoded to text
+BASE64_THRESHOLD = 64 * 1024
+
+
 server = Server("smb-mcp-server")
 
 
 class SMBClient:
     """Manages SMB connections and file operations."""
     
-    def __init__(self):
-        self.sessions: Dict[str, bool] = {}
-    
     def ensure_session(self, hostname: str, username: str, password: str, 
                       domain: str = None) -> str:
         """For localhost testing, just return a mock session key."""
-        session_key = f"{hostname}:{username}"
+        # For localhost testing, no actual SMB session needed
+        if hostname in LOCAL_HOSTS:
+            return 'local'
         
-        if session_key not in self.sessions:
-            # For localhost testing, no actual SMB session needed
-            if hostname in ['localhost', '127.0.0.1']:
-                self.sessions[session_key] = True
-                logger.info(f"Mock SMB session created for localhost testing")
-            else:
-                logger.warning(f"SMB sessions to remote hosts not supported in test mode: {hostname}")
-                raise Exception(f"Remote SMB access not supported in test mode: {hostname}")
-        
-        return session_key
+        logger.warning(f"SMB sessions to remote hosts not supported in test mode: {hostname}")
+        raise Exception(f"Remote SMB access not supported in test mode: {hostname}")
     
     def read_file_tail(self, hostname: str, username: str, password: str,
-                      file_path: str, lines: int = 1000, domain: str = None) -> Dict[str, Any]:
+                      file_path: str, lines: int = 1000, domain: str = None,
+                      include_total_lines: bool = False) -> Dict[str, Any]:
         """Read the last N lines of a file via local access for localhost testing."""
         try:
             self.ensure_session(hostname, username, password, domain)
             
             # For localhost testing, convert path format to local Windows path
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert C$/path format to C:\path
-                if file_path.startswith("C$/"):
-                    local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    # Use os.path.join to avoid f-string backslash issues
-                    clean_path = file_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(file_path)
+                invalidate_cached_stat(local_path)
                 
-                # Read the file locally
-                if not os.path.exists(local_path):
+                # Read the file locally; opening it doubles as the existence check
+                try:
+                    f = open_log(local_path)
+                except FileNotFoundError:
                     return {
                         "success": False,
                         "error": f"File not found: {local_path}",
@@ -76,18 +83,24 @@ class SMBClient:
                         "file_path": file_path
                     }
                 
-                with open(local_path, 'r', encoding='utf-8', errors='replace') as f:
-                    all_lines = f.readlines()
-                    tail_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                    content = ''.join(tail_lines)
+                with f:
+                    tail_bytes = read_tail(f, lines)
+                    total_lines = count_lines(f) if include_total_lines else None
+                    drop_cached_pages(f)
                 
-                return {
+                lines_read = tail_bytes.count(b"\n")
+                if tail_bytes and not tail_bytes.endswith(b"\n"):
+                    lines_read += 1
+                
+                result = {
                     "success": True,
-                    "content": content,
-                    "lines_read": len(tail_lines),
-                    "total_lines": len(all_lines),
+                    "content_bytes": tail_bytes,
+                    "lines_read": lines_read,
                     "file_path": file_path
                 }
+                if total_lines is not None:
+                    result["total_lines"] = total_lines
+                return result
             else:
                 return {
                     "success": False,
@@ -111,52 +124,29 @@ class SMBClient:
         try:
             self.ensure_session(hostname, username, password, domain)
             
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert to local path
-                if dir_path.startswith("C$/"):
-                    local_path = dir_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    clean_path = dir_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(dir_path)
                 
-                if not os.path.exists(local_path):
+                try:
+                    columns = scan_directory(local_path)
+                except FileNotFoundError:
                     return {
                         "success": False,
                         "error": f"Directory not found: {local_path}",
-                        "files": [],
+                        **directory_columns([]),
                         "directory": dir_path
                     }
                 
-                files = []
-                for item in os.listdir(local_path):
-                    try:
-                        item_path = os.path.join(local_path, item)
-                        file_stat = os.stat(item_path)
-                        files.append({
-                            "name": item,
-                            "size": file_stat.st_size,
-                            "modified": file_stat.st_mtime,
-                            "is_dir": os_stat.S_ISDIR(file_stat.st_mode)
-                        })
-                    except Exception as e:
-                        logger.warning(f"Failed to stat {item}: {e}")
-                        files.append({
-                            "name": item,
-                            "size": 0,
-                            "modified": 0,
-                            "is_dir": False
-                        })
-                
                 return {
                     "success": True,
-                    "files": files,
+                    **columns,
                     "directory": dir_path
                 }
             else:
                 return {
                     "success": False,
                     "error": "Remote SMB access not supported in test mode",
-                    "files": [],
+                    **directory_columns([]),
                     "directory": dir_path
                 }
             
@@ -165,7 +155,7 @@ class SMBClient:
             return {
                 "success": False,
                 "error": str(e),
-                "files": [],
+                **directory_columns([]),
                 "directory": dir_path
             }
     
@@ -175,30 +165,32 @@ class SMBClient:
         try:
             self.ensure_session(hostname, username, password, domain)
             
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert to local path
-                if file_path.startswith("C$/"):
-                    local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    clean_path = file_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(file_path)
+                cached = get_cached_stat(local_path)
+                if cached is not None:
+                    return {**cached, "file_path": file_path}
                 
-                if os.path.exists(local_path):
+                try:
                     file_stat = os.stat(local_path)
-                    return {
+                except FileNotFoundError:
+                    result = {
                         "success": True,
-                        "exists": True,
-                        "size": file_stat.st_size,
-                        "modified": file_stat.st_mtime,
-                        "is_dir": os_stat.S_ISDIR(file_stat.st_mode),
+                        "exists": False,
                         "file_path": file_path
                     }
                 else:
-                    return {
+                    result = {
                         "success": True,
-                        "exists": False,
+                        "exists": True,
+                        "size": file_stat.st_size,
+                        "modified": file_stat.st_mtime,
+                        "is_dir": os_stat.S_ISDIR(file_stat.st_mode),
                         "file_path": file_path
                     }
+                
+                store_cached_stat(local_path, result)
+                return result
             else:
                 return {
                     "success": False,
@@ -220,6 +212,68 @@ class SMBClient:
 smb_client = SMBClient()
 
 
+def file_tail_response(result: Dict[str, Any]) -> CallToolResult:
+    """Build a tool response as a small JSON header plus the raw file content."""
+    header = {key: value for key, value in result.items() if key not in ("content", "content_bytes")}
+    content_bytes = result.get("content_bytes")
+    
+    if content_bytes is None:
+        text = result.get("content", "")
+    elif len(content_bytes) > BASE64_THRESHOLD:
+        header["encoding"] = "base64"
+        text = base64.b64encode(content_bytes).decode('ascii')
+    else:
+        text = content_bytes.decode('utf-8', errors='replace')
+    
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=_dumps(header)
+            ),
+            TextContent(
+                type="text",
+                text=text
+            )
+        ]
+    )
+
+
+def json_response(result: Dict[str, Any]) -> CallToolResult:
+    """Build a tool response holding the result as JSON text."""
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=_dumps(result)
+            )
+        ]
+    )
+
+
+# Tool name -> (handler, required arguments, optional arguments with defaults, response builder)
+TOOL_HANDLERS = {
+    "read_file_tail": (
+        smb_client.read_file_tail,
+        ("hostname", "username", "password", "file_path"),
+        (("lines", 1000), ("domain", None), ("include_total_lines", False)),
+        file_tail_response
+    ),
+    "list_directory": (
+        smb_client.list_directory,
+        ("hostname", "username", "password", "dir_path"),
+        (("domain", None),),
+        json_response
+    ),
+    "check_file_exists": (
+        smb_client.check_file_exists,
+        ("hostname", "username", "password", "file_path"),
+        (("domain", None),),
+        json_response
+    ),
+}
+
+
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available SMB tools."""
@@ -254,6 +308,11 @@ async def handle_list_tools() -> List[Tool]:
                     "domain": {
                         "type": "string",
                         "description": "Domain name (optional if included in username)"
+                    },
+                    "include_total_lines": {
+                        "type": "boolean",
+                        "description": "Also count every line in the file (reads the whole file)",
+                        "default": False
                     }
                 },
                 "required": ["hostname", "username", "password", "file_path"]
@@ -325,63 +384,8 @@ async def handle_list_tools() -> List[Tool]:
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResult:
     """Handle tool execution requests."""
-    
-    if name == "read_file_tail":
-        result = smb_client.read_file_tail(
-            hostname=arguments["hostname"],
-            username=arguments["username"],
-            password=arguments["password"],
-            file_path=arguments["file_path"],
-            lines=arguments.get("lines", 1000),
-            domain=arguments.get("domain")
-        )
-        
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2)
-                )
-            ]
-        )
-    
-    elif name == "list_directory":
-        result = smb_client.list_directory(
-            hostname=arguments["hostname"],
-            username=arguments["username"],
-            password=arguments["password"],
-            dir_path=arguments["dir_path"],
-            domain=arguments.get("domain")
-        )
-        
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2)
-                )
-            ]
-        )
-    
-    elif name == "check_file_exists":
-        result = smb_client.check_file_exists(
-            hostname=arguments["hostname"],
-            username=arguments["username"],
-            password=arguments["password"],
-            file_path=arguments["file_path"],
-            domain=arguments.get("domain")
-        )
-        
-        return CallToolResult(
-            content=[
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2)
-                )
-            ]
-        )
-    
-    else:
+    tool = TOOL_HANDLERS.get(name)
+    if tool is None:
         return CallToolResult(
             content=[
                 TextContent(
@@ -391,6 +395,13 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResu
             ],
             isError=True
         )
+    
+    func, required, optional, respond = tool
+    kwargs = {key: arguments[key] for key in required}
+    kwargs.update((key, arguments.get(key, default)) for key, default in optional)
+    
+    result = await asyncio.to_thread(func, **kwargs)
+    return respond(result)
 
 
 async def main():
@@ -4,37 +4,50 @@ FastMCP Server for SMB/CIFS file access on remote Windows machines.
 Provides tools for reading log files via SMB shares.
 """
 
+import asyncio
 import os
 import stat as os_stat
 import logging
 from typing import Any, Dict
 from fastmcp import FastMCP
 
+from loggatheringagent.core.local_files import (
+    LOCAL_HOSTS,
+    count_lines,
+    directory_columns,
+    drop_cached_pages,
+    get_cached_stat,
+    invalidate_cached_stat,
+    open_log,
+    read_tail,
+    scan_directory,
+    store_cached_stat,
+    to_local,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
 # Create FastMCP app
 mcp = FastMCP("SMB File Access Server")
 
 
-@mcp.tool()
-def read_file_tail(hostname: str, username: str, password: str,
-                  file_path: str, lines: int = 1000, domain: str = None) -> Dict[str, Any]:
+def _read_file_tail(hostname: str, username: str, password: str,
+                  file_path: str, lines: int = 1000, domain: str = None,
+                  include_total_lines: bool = False) -> Dict[str, Any]:
     """Read the last N lines of a file via local access for localhost testing."""
     try:
         # For localhost testing, convert path format to local Windows path
-        if hostname in ['localhost', '127.0.0.1']:
-            # Convert C$/path format to C:\\path
-            if file_path.startswith("C$/"):
-                local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-            else:
-                # Use os.path.join to avoid f-string backslash issues
-                clean_path = file_path.replace('/', '\\')
-                local_path = f"C:\\{clean_path}"
+        if hostname in LOCAL_HOSTS:
+            local_path = to_local(file_path)
+            invalidate_cached_stat(local_path)
             
-            # Read the file locally
-            if not os.path.exists(local_path):
+            # Read the file locally; opening it doubles as the existence check
+            try:
+                f = open_log(local_path)
+            except FileNotFoundError:
                 return {
                     "success": False,
                     "error": f"File not found: {local_path}",
@@ -42,18 +55,24 @@ def read_file_tail(hostname: str, username: str, password: str,
                     "file_path": file_path
                 }
             
-            with open(local_path, 'r', encoding='utf-8', errors='replace') as f:
-                all_lines = f.readlines()
-                tail_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                content = ''.join(tail_lines)
+            with f:
+                tail_bytes = read_tail(f, lines)
+                total_lines = count_lines(f) if include_total_lines else None
+                drop_cached_pages(f)
             
-            return {
+            lines_read = tail_bytes.count(b"\n")
+            if tail_bytes and not tail_bytes.endswith(b"\n"):
+                lines_read += 1
+            
+            result = {
                 "success": True,
-                "content": content,
-                "lines_read": len(tail_lines),
-                "total_lines": len(all_lines),
+                "content": tail_bytes.decode('utf-8', errors='replace'),
+                "lines_read": lines_read,
                 "file_path": file_path
             }
+            if total_lines is not None:
+                result["total_lines"] = total_lines
+            return result
         else:
             return {
                 "success": False,
@@ -72,57 +91,33 @@ def read_file_tail(hostname: str, username: str, password: str,
         }
 
 
-@mcp.tool()
-def list_directory(hostname: str, username: str, password: str,
+def _list_directory(hostname: str, username: str, password: str,
                   dir_path: str, domain: str = None) -> Dict[str, Any]:
     """List contents of a directory via local access for localhost testing."""
     try:
-        if hostname in ['localhost', '127.0.0.1']:
-            # Convert to local path
-            if dir_path.startswith("C$/"):
-                local_path = dir_path.replace("C$/", "C:\\").replace("/", "\\")
-            else:
-                clean_path = dir_path.replace('/', '\\')
-                local_path = f"C:\\{clean_path}"
+        if hostname in LOCAL_HOSTS:
+            local_path = to_local(dir_path)
             
-            if not os.path.exists(local_path):
+            try:
+                columns = scan_directory(local_path)
+            except FileNotFoundError:
                 return {
                     "success": False,
                     "error": f"Directory not found: {local_path}",
-                    "files": [],
+                    **directory_columns([]),
                     "directory": dir_path
                 }
             
-            files = []
-            for item in os.listdir(local_path):
-                try:
-                    item_path = os.path.join(local_path, item)
-                    file_stat = os.stat(item_path)
-                    files.append({
-                        "name": item,
-                        "size": file_stat.st_size,
-                        "modified": file_stat.st_mtime,
-                        "is_dir": os_stat.S_ISDIR(file_stat.st_mode)
-                    })
-                except Exception as e:
-                    logger.warning(f"Failed to stat {item}: {e}")
-                    files.append({
-                        "name": item,
-                        "size": 0,
-                        "modified": 0,
-                        "is_dir": False
-                    })
-            
             return {
                 "success": True,
-                "files": files,
+                **columns,
                 "directory": dir_path
             }
         else:
             return {
                 "success": False,
                 "error": "Remote SMB access not supported in test mode",
-                "files": [],
+                **directory_columns([]),
                 "directory": dir_path
             }
         
@@ -131,40 +126,41 @@ def list_directory(hostname: str, username: str, password: str,
         return {
             "success": False,
             "error": str(e),
-            "files": [],
+            **directory_columns([]),
             "directory": dir_path
         }
 
 
-@mcp.tool()
-def check_file_exists(hostname: str, username: str, password: str,
+def _check_file_exists(hostname: str, username: str, password: str,
                      file_path: str, domain: str = None) -> Dict[str, Any]:
     """Check if a file exists and get its basic info via local access for localhost testing."""
     try:
-        if hostname in ['localhost', '127.0.0.1']:
-            # Convert to local path
-            if file_path.startswith("C$/"):
-                local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-            else:
-                clean_path = file_path.replace('/', '\\')
-                local_path = f"C:\\{clean_path}"
+        if hostname in LOCAL_HOSTS:
+            local_path = to_local(file_path)
+            cached = get_cached_stat(local_path)
+            if cached is not None:
+                return {**cached, "file_path": file_path}
             
-            if os.path.exists(local_path):
+            try:
                 file_stat = os.stat(local_path)
-                return {
+            except FileNotFoundError:
+                result = {
                     "success": True,
-                    "exists": True,
-                    "size": file_stat.st_size,
-                    "modified": file_stat.st_mtime,
-                    "is_dir": os_stat.S_ISDIR(file_stat.st_mode),
+                    "exists": False,
                     "file_path": file_path
                 }
             else:
-                return {
+                result = {
                     "success": True,
-                    "exists": False,
+                    "exists": True,
+                    "size": file_stat.st_size,
+                    "modified": file_stat.st_mtime,
+                    "is_dir": os_stat.S_ISDIR(file_stat.st_mode),
                     "file_path": file_path
                 }
+            
+            store_cached_stat(local_path, result)
+            return result
         else:
             return {
                 "success": False,
@@ -182,5 +178,29 @@ def check_file_exists(hostname: str, username: str, password: str,
         }
 
 
+@mcp.tool()
+async def read_file_tail(hostname: str, username: str, password: str,
+                         file_path: str, lines: int = 1000, domain: str = None,
+                         include_total_lines: bool = False) -> Dict[str, Any]:
+    """Read the last N lines of a file via local access for localhost testing."""
+    return await asyncio.to_thread(
+        _read_file_tail, hostname, username, password, file_path, lines, domain, include_total_lines
+    )
+
+
+@mcp.tool()
+async def list_directory(hostname: str, username: str, password: str,
+                         dir_path: str, domain: str = None) -> Dict[str, Any]:
+    """List contents of a directory via local access for localhost testing."""
+    return await asyncio.to_thread(_list_directory, hostname, username, password, dir_path, domain)
+
+
+@mcp.tool()
+async def check_file_exists(hostname: str, username: str, password: str,
+                            file_path: str, domain: str = None) -> Dict[str, Any]:
+    """Check if a file exists and get its basic info via local access for localhost testing."""
+    return await asyncio.to_thread(_check_file_exists, hostname, username, password, file_path, domain)
+
+
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
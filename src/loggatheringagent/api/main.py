@@ -4,32 +4,136 @@ Provides REST API endpoints and chatbot interface.
 """
 
 import asyncio
+import copy
+import itertools
 import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from dataclasses import fields
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, HTMLResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+import httpx
+import orjson
 import structlog
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 from ..config.settings import Settings
 from ..core.log_collector import WindowsLogCollector, ClientLogCollection
-from ..core.llm_analyzer import WindowsLogAnalyzer, ClientAnalysisResult
+from ..core.llm_analyzer import WindowsLogAnalyzer, ClientAnalysisResult, LogAnalysisResult
 
-# Configure structured logging
-structlog.configure(
+# Global settings
+settings = Settings()
+
+# Configure structured logging. Events below the level are rejected by the bound logger
+# before any processor runs; exc_info is only captured on the caller's thread and the
+# traceback is rendered later by the listener.
+_log_level = logging.DEBUG if settings.debug else logging.INFO
+
+
+def _capture_exc_info(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve exc_info=True to the active exception while it is still in scope."""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+_log_processors = [
+    structlog.processors.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso", utc=True),
+    _capture_exc_info,
+]
+
+
+def _orjson_str(obj: Any, **kwargs) -> str:
+    """Serialize a log event with orjson for a text stream handler."""
+    return orjson.dumps(obj, default=kwargs.get("default")).decode()
+
+
+# Identical info/debug events for one request are logged at most once per window
+LOG_DEDUPE_WINDOW = 5.0
+_recent_log_events: Dict[Tuple[Any, Any], float] = {}
+
+
+def _drop_repeated_events(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop an event already logged for the same request_id within the dedupe window."""
+    request_id = event_dict.get("request_id")
+    if request_id is None or method_name not in ("debug", "info"):
+        return event_dict
+    
+    key = (request_id, event_dict.get("event"))
+    now = time.monotonic()
+    last = _recent_log_events.get(key)
+    if last is not None and now - last < LOG_DEDUPE_WINDOW:
+        raise structlog.DropEvent
+    if len(_recent_log_events) >= 1024:
+        _recent_log_events.clear()
+    _recent_log_events[key] = now
+    return event_dict
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue structlog records as-is so JSON rendering happens on the listener thread."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if isinstance(record.msg, dict):
+            # structlog event dicts are owned by the record, so rendering can wait
+            return record
+        # Foreign stdlib records may reference mutable args, so format them now
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Shed log records rather than block the event loop when stdout falls behind;
+            # the count is reported by /health
+            self.dropped += 1
+
+
+# The event loop only enqueues records; a QueueListener thread renders them
+# to JSON and writes stdout, so pipe backpressure never stalls a request.
+_log_stream_handler = logging.StreamHandler(sys.stdout)
+_log_stream_handler.setFormatter(structlog.stdlib.ProcessorFormatter(
+    foreign_pre_chain=_log_processors,
     processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
+        structlog.stdlib.ProcessorFormatter.remove_processors_meta,
         structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
+        structlog.processors.JSONRenderer(serializer=_orjson_str),
     ],
+))
+_log_queue: queue.Queue = queue.Queue(maxsize=10000)
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+
+_log_queue_handler = _DeferredQueueHandler(_log_queue)
+_root_logger = logging.getLogger()
+_root_logger.addHandler(_log_queue_handler)
+_root_logger.setLevel(_log_level)
+
+structlog.configure(
+    processors=[_drop_repeated_events] + _log_processors + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+    wrapper_class=structlog.make_filtering_bound_logger(_log_level),
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
     cache_logger_on_first_use=True,
@@ -37,37 +141,126 @@ structlog.configure(
 
 logger = structlog.get_logger(__name__)
 
-# Global settings
-settings = Settings()
-
 # Create FastAPI app
 app = FastAPI(
     title="Windows Log Gathering Agent",
     description="Centralized log collection and LLM analysis for Windows deployment troubleshooting",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify actual origins
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=3600,  # Let browsers cache preflight responses for an hour
 )
 
 # Global instances
 log_collector = WindowsLogCollector(settings)
 log_analyzer = WindowsLogAnalyzer(settings)
 
-# In-memory storage for analysis results (in production, use database)
-analysis_cache: Dict[str, Dict[str, Any]] = {}
+
+class AnalysisCache:
+    """Bounded, expiring in-memory analysis store that keeps the /health counters up to date on write.
+    
+    Eviction is in write order, not LRU: reads do not refresh an entry, so the entry written
+    least recently is dropped first when the store is full or its TTL runs out.
+    """
+    
+    def __init__(self, maxsize: int = 2048, ttl: float = 24 * 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.analysis_count = 0
+        self.client_result_count = 0
+        self.last_analysis: Optional[datetime] = None
+    
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        if key in self._data:
+            self._data.move_to_end(key)
+        else:
+            self._count(key, 1)
+        self._data[key] = (time.monotonic(), value)
+        
+        timestamp = value.get("timestamp")
+        if isinstance(timestamp, datetime) and (self.last_analysis is None or timestamp > self.last_analysis):
+            self.last_analysis = timestamp
+        
+        self.purge_expired()
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+    
+    def _count(self, key: str, delta: int):
+        if key.startswith('analysis_'):
+            self.analysis_count += delta
+        else:
+            self.client_result_count += delta
+    
+    def _remove(self, key: str):
+        """Drop an entry, keeping the counters and last_analysis in step."""
+        _, value = self._data.pop(key)
+        self._count(key, -1)
+        if self.last_analysis is not None and value.get("timestamp") == self.last_analysis:
+            timestamps = [
+                entry_value["timestamp"] for _, entry_value in self._data.values()
+                if isinstance(entry_value.get("timestamp"), datetime)
+            ]
+            self.last_analysis = max(timestamps, default=None)
+    
+    def purge_expired(self):
+        """Drop expired entries; entries stay in write order, so they all sit at the front."""
+        cutoff = time.monotonic() - self.ttl
+        while self._data:
+            key, (stored_at, _) = next(iter(self._data.items()))
+            if stored_at > cutoff:
+                break
+            self._remove(key)
+    
+    def _live(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return an unexpired entry, or drop it if it has expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            self._remove(key)
+            return None
+        return value
+    
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        value = self._live(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __contains__(self, key: str) -> bool:
+        return self._live(key) is not None
+    
+    def __len__(self) -> int:
+        self.purge_expired()
+        return len(self._data)
+    
+    def keys(self):
+        self.purge_expired()
+        return self._data.keys()
+
+
+# In-memory storage for analysis results (in production, use database).
+# Entry "timestamp" values are always native datetime objects, never ISO strings, so the
+# cache can track the latest analysis with a plain comparison on write.
+analysis_cache = AnalysisCache()
 
 
 # Pydantic models for API
 class AnalysisRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     client_names: List[str]
     include_summary: bool = True
     force_refresh: bool = False
@@ -90,6 +283,8 @@ class AnalysisResponse(BaseModel):
 
 
 class ChatMessage(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     message: str
     context: Optional[Dict[str, Any]] = None
 
@@ -101,20 +296,115 @@ class ChatResponse(BaseModel):
     client_names: List[str] = []
 
 
+# Request ids combine the process id with a counter, so same-second requests never collide
+_request_counter = itertools.count()
+
+
+def _next_request_id(prefix: str) -> str:
+    """Return a process-unique request id such as analysis_1234_7."""
+    return f"{prefix}_{os.getpid()}_{next(_request_counter)}"
+
+
 # Dependency to get settings
 def get_settings():
     return settings
 
 
+@lru_cache(maxsize=1)
+def _cached_machines_config():
+    """Parse the machines config once; cleared by /admin/reload-config."""
+    return settings.load_machines_config()
+
+
+@lru_cache(maxsize=1)
+def _client_mention_index() -> Tuple[Dict[str, str], Optional[re.Pattern]]:
+    """Map lowercased client names/hostnames to client names, with one regex matching any of them."""
+    lookup: Dict[str, str] = {}
+    for client in _cached_machines_config().clients:
+        for key in (client.name.lower(), client.hostname.lower()):
+            if key:
+                lookup.setdefault(key, client.name)
+    
+    if not lookup:
+        return lookup, None
+    # Longest first so a name is not shadowed by a shorter one it contains
+    alternatives = sorted(lookup, key=len, reverse=True)
+    return lookup, re.compile("|".join(re.escape(key) for key in alternatives))
+
+
+@app.on_event("startup")
+async def startup():
+    """Start the log listener, load the tokenizer and open the pooled HTTP client shared by LLM health probes."""
+    log_listener.start()
+    # Loaded in a worker thread so a slow BPE download never blocks the loop
+    app.state.encoding_task = asyncio.create_task(log_analyzer.load_encoding())
+    app.state.llm_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(connect=1.0, read=3.0, write=3.0, pool=3.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+    app.state.llm_status_lock = asyncio.Lock()
+    app.state.cpu_pct = 0
+    app.state.memory_pct = 0
+    app.state.metrics_task = asyncio.create_task(_sample_system_metrics())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the metrics sampler, close the pooled HTTP clients and flush queued logs."""
+    app.state.metrics_task.cancel()
+    await app.state.llm_client.aclose()
+    await log_analyzer.aclose()
+    log_listener.stop()
+
+
+async def _sample_system_metrics():
+    """Refresh CPU and memory usage once a second with non-blocking psutil calls."""
+    if psutil is None:
+        logger.warning("psutil not installed, system metrics disabled")
+        return
+    
+    # The first interval=None call only primes the counter
+    psutil.cpu_percent(interval=None)
+    while True:
+        try:
+            app.state.cpu_pct = psutil.cpu_percent(interval=None)
+            app.state.memory_pct = psutil.virtual_memory().percent
+        except Exception as e:
+            logger.warning("Error sampling system metrics", error=str(e))
+        await asyncio.sleep(1.0)
+
+
+# LLM probe results are shared by /health calls for this many seconds
+LLM_STATUS_TTL = 5.0
+_llm_status_cache: Dict[str, Any] = {"value": None, "ts": 0.0}
+
+
+async def _get_llm_status() -> str:
+    """Probe the LLM endpoint, reusing a recent result; concurrent callers share one probe."""
+    async with app.state.llm_status_lock:
+        if _llm_status_cache["value"] is not None and time.monotonic() - _llm_status_cache["ts"] < LLM_STATUS_TTL:
+            return _llm_status_cache["value"]
+        
+        try:
+            machines_config = _cached_machines_config()
+            response = await app.state.llm_client.get(f"{machines_config.llm_config.endpoint}/v1/models")
+            if response.status_code == 200:
+                llm_status = "connected"
+            else:
+                llm_status = "error"
+        except:
+            llm_status = "offline"
+        
+        _llm_status_cache["value"] = llm_status
+        _llm_status_cache["ts"] = time.monotonic()
+        return llm_status
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Enhanced health check endpoint with system metrics."""
     try:
-        # Calculate uptime
-        import time
-        import psutil
-        
         # Get system uptime (in seconds since server start)
         current_time = datetime.now()
         if not hasattr(health_check, 'start_time'):
@@ -123,49 +413,23 @@ async def health_check():
         
         # Get number of configured clients
         try:
-            machines_config = settings.load_machines_config()
+            machines_config = _cached_machines_config()
             configured_clients = len(machines_config.clients)
         except:
             configured_clients = 0
         
-        # Get number of clients with recent analysis
-        clients_with_analysis = len([k for k in analysis_cache.keys() if not k.startswith('analysis_')])
-        
-        # Find last analysis time
-        last_analysis = None
-        for cache_key, cache_value in analysis_cache.items():
-            if isinstance(cache_value, dict) and 'timestamp' in cache_value:
-                analysis_time = cache_value['timestamp']
-                if isinstance(analysis_time, str):
-                    try:
-                        analysis_time = datetime.fromisoformat(analysis_time.replace('Z', '+00:00'))
-                    except:
-                        continue
-                if last_analysis is None or analysis_time > last_analysis:
-                    last_analysis = analysis_time
-        
-        # Get system memory usage
-        try:
-            memory = psutil.virtual_memory()
-            memory_usage_percent = memory.percent
-            cpu_usage = psutil.cpu_percent(interval=0.1)
-        except:
-            memory_usage_percent = 0
-            cpu_usage = 0
+        # Counters are maintained by the cache on write; expired entries only need
+        # dropping from the front, so no full scan is needed here
+        analysis_cache.purge_expired()
+        clients_with_analysis = analysis_cache.client_result_count
+        last_analysis = analysis_cache.last_analysis
+        
+        # System usage is sampled in the background so the probe never blocks the loop
+        memory_usage_percent = app.state.memory_pct
+        cpu_usage = app.state.cpu_pct
         
         # Test LLM connection (quick check without full request)
-        llm_status = "unknown"
-        try:
-            import httpx
-            machines_config = settings.load_machines_config()
-            async with httpx.AsyncClient(timeout=3.0) as client:
-                response = await client.get(f"{machines_config.llm_config.endpoint}/v1/models")
-                if response.status_code == 200:
-                    llm_status = "connected"
-                else:
-                    llm_status = "error"
-        except:
-            llm_status = "offline"
+        llm_status = await _get_llm_status()
         
         return {
             "status": "healthy",
@@ -177,8 +441,9 @@ async def health_check():
             "system_metrics": {
                 "memory_usage_percent": memory_usage_percent,
                 "cpu_usage_percent": cpu_usage,
-                "active_analyses": len([k for k in analysis_cache.keys() if k.startswith('analysis_')]),
-                "cache_size": len(analysis_cache)
+                "active_analyses": analysis_cache.analysis_count,
+                "cache_size": len(analysis_cache),
+                "dropped_log_records": _log_queue_handler.dropped
             },
             "timestamp": current_time
         }
@@ -195,11 +460,12 @@ async def health_check():
 
 
 # List available clients
-@app.get("/clients", response_model=List[ClientStatus])
-async def list_clients():
+# Response models are built by the handlers themselves, so FastAPI skips re-validating them
+@app.get("/clients", response_model=None)
+async def list_clients() -> List[ClientStatus]:
     """Get list of configured client machines."""
     try:
-        machines_config = settings.load_machines_config()
+        machines_config = _cached_machines_config()
         client_statuses = []
         
         for client in machines_config.clients:
@@ -226,12 +492,31 @@ async def list_clients():
         raise HTTPException(status_code=500, detail=f"Error listing clients: {str(e)}")
 
 
+# Reload machines configuration
+@app.post("/admin/reload-config")
+async def reload_config():
+    """Drop the cached machines configuration so the next request re-reads it."""
+    _cached_machines_config.cache_clear()
+    _client_mention_index.cache_clear()
+    try:
+        machines_config = _cached_machines_config()
+    except Exception as e:
+        logger.error("Error reloading config", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error reloading config: {str(e)}")
+    
+    logger.info("Machines config reloaded", clients=len(machines_config.clients))
+    return {
+        "status": "reloaded",
+        "clients": len(machines_config.clients)
+    }
+
+
 # Start log analysis
-@app.post("/analyze", response_model=Dict[str, str])
-async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks):
+@app.post("/analyze", response_model=None)
+async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks) -> Dict[str, str]:
     """Start log analysis for specified clients."""
     try:
-        request_id = f"analysis_{int(datetime.now().timestamp())}"
+        request_id = _next_request_id("analysis")
         
         logger.info("Starting analysis", 
                    request_id=request_id, 
@@ -276,7 +561,7 @@ async def get_analysis_results(request_id: str):
             return {
                 "request_id": request_id,
                 "status": "not_found",
-                "message": "Analysis results not found - it may still be in progress or has expired"
+                "message": "Analysis results not found or expired"
             }
             
     except Exception as e:
@@ -285,6 +570,70 @@ async def get_analysis_results(request_id: str):
         raise HTTPException(status_code=500, detail=f"Error retrieving results: {str(e)}")
 
 
+# Stream analysis progress
+@app.get("/analyze/{request_id}/stream")
+async def stream_analysis_results(request_id: str):
+    """Push analysis state changes for a request as Server-Sent Events."""
+    return StreamingResponse(
+        _analysis_events(request_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+# Seconds between SSE keepalive comments; an id still unknown after two of them is reported missing
+SSE_KEEPALIVE = 15.0
+ANALYSIS_TERMINAL_STATES = frozenset({"completed", "failed"})
+
+# Subscribers waiting on analysis state changes, keyed by request id
+_analysis_subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+
+def _publish_analysis(request_id: str, entry: Dict[str, Any]):
+    """Hand the current state of an analysis to everyone streaming it."""
+    for subscriber in _analysis_subscribers.get(request_id, ()):
+        subscriber.put_nowait(entry)
+
+
+async def _analysis_events(request_id: str):
+    """Yield SSE frames for an analysis until it completes or fails.
+    
+    The subscriber is registered here rather than in the handler, so it exists only while
+    the generator runs and the finally block always removes it.
+    """
+    subscriber: asyncio.Queue = asyncio.Queue()
+    try:
+        _analysis_subscribers.setdefault(request_id, []).append(subscriber)
+        entry = analysis_cache[request_id] if request_id in analysis_cache else None
+        idle = 0
+        while True:
+            if entry is not None:
+                yield b"data: " + orjson.dumps(entry) + b"\n\n"
+                if entry.get("status") in ANALYSIS_TERMINAL_STATES:
+                    return
+                idle = 0
+            
+            try:
+                entry = await asyncio.wait_for(subscriber.get(), timeout=SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                entry = None
+                idle += 1
+                if idle >= 2 and request_id not in analysis_cache:
+                    yield b"data: " + orjson.dumps({
+                        "request_id": request_id,
+                        "status": "not_found",
+                        "message": "Analysis results not found or expired"
+                    }) + b"\n\n"
+                    return
+                yield b": keepalive\n\n"
+    finally:
+        subscribers = _analysis_subscribers.get(request_id, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+        if not subscribers:
+            _analysis_subscribers.pop(request_id, None)
+
+
 # Get specific client analysis
 @app.get("/clients/{client_name}/analysis")
 async def get_client_analysis(client_name: str):
@@ -310,32 +659,8 @@ async def collect_client_logs(client_name: str):
     try:
         logger.info("Starting log collection", client_name=client_name)
         
-        # Initialize settings and collector
-        settings = Settings()
-        collector = WindowsLogCollector(settings)
-        
         # Collect logs
-        result = await collector.collect_client_logs(client_name)
-        
-        # Convert to API response format
-        response = {
-            "client_name": result.client_name,
-            "hostname": result.hostname,
-            "success": result.success,
-            "timestamp": result.timestamp.isoformat(),
-            "log_results": [
-                {
-                    "source": log_result.source,
-                    "success": log_result.success,
-                    "content": log_result.content if log_result.success else "",
-                    "error": log_result.error,
-                    "lines_count": log_result.lines_count,
-                    "timestamp": log_result.timestamp.isoformat()
-                }
-                for log_result in result.log_results
-            ],
-            "errors": result.errors
-        }
+        result = await log_collector.collect_client_logs(client_name)
         
         logger.info("Log collection completed", 
                    client_name=client_name, 
@@ -343,7 +668,8 @@ async def collect_client_logs(client_name: str):
                    results_count=len(result.log_results),
                    errors_count=len(result.errors))
         
-        return response
+        # Streamed as NDJSON so each log body is encoded on its own instead of in one large document
+        return StreamingResponse(_collection_ndjson(result), media_type="application/x-ndjson")
         
     except Exception as e:
         logger.error("Error collecting logs", 
@@ -351,12 +677,33 @@ async def collect_client_logs(client_name: str):
         raise HTTPException(status_code=500, detail=f"Log collection failed: {str(e)}")
 
 
+def _collection_ndjson(result: ClientLogCollection):
+    """Yield a collection as NDJSON: a header line, then one line per log result."""
+    yield orjson.dumps({
+        "client_name": result.client_name,
+        "hostname": result.hostname,
+        "success": result.success,
+        "timestamp": result.timestamp,
+        "errors": result.errors
+    }, option=orjson.OPT_APPEND_NEWLINE)
+    
+    for log_result in result.log_results:
+        yield orjson.dumps({
+            "source": log_result.source,
+            "success": log_result.success,
+            "content": log_result.content if log_result.success else "",
+            "error": log_result.error,
+            "lines_count": log_result.lines_count,
+            "timestamp": log_result.timestamp
+        }, option=orjson.OPT_APPEND_NEWLINE)
+
+
 # Quick analyze single client
 @app.post("/clients/{client_name}/analyze")
 async def analyze_single_client(client_name: str, background_tasks: BackgroundTasks):
     """Quick analysis of a single client."""
     try:
-        request_id = f"single_{client_name}_{int(datetime.now().timestamp())}"
+        request_id = _next_request_id(f"single_{client_name}")
         
         logger.info("Starting single client analysis", 
                    client_name=client_name, request_id=request_id)
@@ -394,322 +741,59 @@ async def chat_with_bot(message: ChatMessage, background_tasks: BackgroundTasks)
         )
 
 
-# Simple web interface
+# Simple web interface - served from disk so Starlette can hand the file to sendfile()
+INDEX_HTML_PATH = Path(__file__).parent / "static" / "index.html"
+
+
 @app.get("/", response_class=HTMLResponse)
 async def web_interface():
     """Enhanced web interface with real-time logging."""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Windows Log Gathering Agent</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; }
-            .container { max-width: 1200px; display: grid; grid-template-columns: 1fr 1fr; gap: 20px; }
-            .left-panel { }
-            .right-panel { }
-            .section { margin: 20px 0; padding: 20px; border: 1px solid #ccc; border-radius: 5px; }
-            .button-group { display: flex; gap: 10px; flex-wrap: wrap; }
-            button { padding: 10px 20px; margin: 5px 0; cursor: pointer; border: none; border-radius: 3px; }
-            .btn-primary { background: #007bff; color: white; }
-            .btn-success { background: #28a745; color: white; }
-            .btn-warning { background: #ffc107; color: black; }
-            .btn-info { background: #17a2b8; color: white; }
-            button:hover { opacity: 0.8; }
-            pre { background: #f5f5f5; padding: 15px; overflow-x: auto; border-radius: 3px; }
-            input, textarea { width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #ccc; border-radius: 3px; }
-            #logWindow { 
-                height: 400px; 
-                overflow-y: auto; 
-                background: #1e1e1e; 
-                color: #00ff00; 
-                padding: 15px; 
-                border-radius: 3px;
-                font-family: 'Courier New', monospace;
-                font-size: 12px;
-                line-height: 1.4;
-            }
-            .log-entry { margin-bottom: 5px; }
-            .log-info { color: #00ff00; }
-            .log-warning { color: #ffff00; }
-            .log-error { color: #ff0000; }
-            .log-debug { color: #888888; }
-            .status-indicator { 
-                display: inline-block; 
-                width: 10px; 
-                height: 10px; 
-                border-radius: 50%; 
-                margin-right: 5px; 
-            }
-            .status-success { background: #28a745; }
-            .status-warning { background: #ffc107; }
-            .status-error { background: #dc3545; }
-            .status-info { background: #17a2b8; }
-            #chatResponse { 
-                background: #f8f9fa; 
-                padding: 15px; 
-                border-radius: 3px; 
-                margin-top: 10px;
-                border-left: 4px solid #007bff;
-            }
-        </style>
-    </head>
-    <body>
-        <h1>🖥️ Windows Log Gathering Agent</h1>
-        
-        <div class="container">
-            <div class="left-panel">
-                <div class="section">
-                    <h2>🚀 Quick Actions</h2>
-                    <div class="button-group">
-                        <button class="btn-info" onclick="listClients()">📋 List Clients</button>
-                        <button class="btn-success" onclick="analyzeAll()">🔍 Analyze All</button>
-                        <button class="btn-primary" onclick="checkHealth()">💚 Health Check</button>
-                        <button class="btn-warning" onclick="clearLogs()">🗑️ Clear Logs</button>
-                    </div>
-                </div>
-                
-                <div class="section">
-                    <h2>💬 Chat Interface</h2>
-                    <textarea id="chatInput" placeholder="Ask about log analysis, client status, or request specific analysis..." rows="3"></textarea>
-                    <button class="btn-primary" onclick="sendChatMessage()">Send Message</button>
-                    <div id="chatResponse"></div>
-                </div>
-                
-                <div class="section">
-                    <h2>📊 Results</h2>
-                    <pre id="results">Results will appear here...</pre>
-                </div>
-            </div>
-            
-            <div class="right-panel">
-                <div class="section">
-                    <h2>🔍 Live Process Log</h2>
-                    <div style="margin-bottom: 10px;">
-                        <span class="status-indicator status-success"></span>Ready
-                        <span style="float: right;">
-                            <button class="btn-info" onclick="toggleAutoScroll()">Auto-scroll: ON</button>
-                        </span>
-                    </div>
-                    <div id="logWindow"></div>
-                </div>
-                
-                <div class="section">
-                    <h2>⚙️ System Status</h2>
-                    <div id="systemStatus">
-                        <div><strong>Server:</strong> <span class="status-indicator status-success"></span>Running</div>
-                        <div><strong>LLM Endpoint:</strong> <span id="llmStatus">Not tested</span></div>
-                        <div><strong>Last Analysis:</strong> <span id="lastAnalysis">Never</span></div>
-                        <div><strong>Active Clients:</strong> <span id="activeClients">0</span></div>
-                    </div>
-                </div>
-            </div>
-        </div>
-        
-        <script>
-            let autoScroll = true;
-            let requestIdTracker = {};
-            
-            function addLog(message, type = 'info') {
-                const logWindow = document.getElementById('logWindow');
-                const timestamp = new Date().toLocaleTimeString();
-                const logEntry = document.createElement('div');
-                logEntry.className = `log-entry log-${type}`;
-                logEntry.innerHTML = `[${timestamp}] ${message}`;
-                logWindow.appendChild(logEntry);
-                
-                if (autoScroll) {
-                    logWindow.scrollTop = logWindow.scrollHeight;
-                }
-            }
-            
-            function clearLogs() {
-                document.getElementById('logWindow').innerHTML = '';
-                addLog('Logs cleared', 'info');
-            }
-            
-            function toggleAutoScroll() {
-                autoScroll = !autoScroll;
-                const btn = event.target;
-                btn.textContent = `Auto-scroll: ${autoScroll ? 'ON' : 'OFF'}`;
-                addLog(`Auto-scroll ${autoScroll ? 'enabled' : 'disabled'}`, 'debug');
-            }
-            
-            async function apiCall(endpoint, method = 'GET', body = null, showLogs = true) {
-                if (showLogs) {
-                    addLog(`📡 API Call: ${method} ${endpoint}`, 'info');
-                }
-                
-                try {
-                    const options = { method };
-                    if (body) {
-                        options.headers = { 'Content-Type': 'application/json' };
-                        options.body = JSON.stringify(body);
-                        if (showLogs) {
-                            addLog(`📤 Request body: ${JSON.stringify(body, null, 2)}`, 'debug');
-                        }
-                    }
-                    
-                    const response = await fetch(endpoint, options);
-                    const result = await response.json();
-                    
-                    if (showLogs) {
-                        addLog(`📥 Response (${response.status}): ${JSON.stringify(result, null, 2)}`, response.ok ? 'info' : 'error');
-                    }
-                    
-                    return result;
-                } catch (error) {
-                    if (showLogs) {
-                        addLog(`❌ API Error: ${error.message}`, 'error');
-                    }
-                    return { error: error.message };
-                }
-            }
-            
-            async function listClients() {
-                addLog('🔍 Fetching client list...', 'info');
-                const result = await apiCall('/clients');
-                document.getElementById('results').textContent = JSON.stringify(result, null, 2);
-                
-                if (result.length) {
-                    document.getElementById('activeClients').textContent = result.length;
-                    addLog(`✅ Found ${result.length} configured clients`, 'info');
-                } else {
-                    addLog('⚠️ No clients configured', 'warning');
-                }
-            }
-            
-            async function analyzeAll() {
-                addLog('🚀 Starting analysis process...', 'info');
-                
-                // First get clients
-                const clients = await apiCall('/clients', 'GET', null, false);
-                if (clients.error) {
-                    addLog(`❌ Failed to get clients: ${clients.error}`, 'error');
-                    document.getElementById('results').textContent = 'Error: ' + clients.error;
-                    return;
-                }
-                
-                addLog(`📋 Found ${clients.length} clients to analyze`, 'info');
-                const clientNames = clients.map(c => c.name);
-                
-                // Start analysis
-                addLog('🔄 Submitting analysis request...', 'info');
-                const result = await apiCall('/analyze', 'POST', { 
-                    client_names: clientNames, 
-                    include_summary: true,
-                    force_refresh: true
-                });
-                
-                document.getElementById('results').textContent = JSON.stringify(result, null, 2);
-                
-                if (result.request_id) {
-                    addLog(`✅ Analysis started with ID: ${result.request_id}`, 'info');
-                    requestIdTracker[result.request_id] = Date.now();
-                    
-                    // Poll for results
-                    pollAnalysisResults(result.request_id);
-                } else {
-                    addLog('❌ Analysis failed to start', 'error');
-                }
-            }
-            
-            async function pollAnalysisResults(requestId) {
-                addLog(`🔄 Checking analysis progress for ${requestId}...`, 'debug');
-                
-                const result = await apiCall(`/analyze/${requestId}`, 'GET', null, false);
-                
-                if (result.status === 'completed') {
-                    addLog(`✅ Analysis completed for ${requestId}!`, 'info');
-                    document.getElementById('results').textContent = JSON.stringify(result, null, 2);
-                    document.getElementById('lastAnalysis').textContent = new Date().toLocaleTimeString();
-                    
-                    // Show summary
-                    if (result.summary) {
-                        addLog(`📊 Summary: ${result.summary}`, 'info');
-                    }
-                } else if (result.status === 'failed') {
-                    addLog(`❌ Analysis failed for ${requestId}: ${result.error || 'Unknown error'}`, 'error');
-                    document.getElementById('results').textContent = JSON.stringify(result, null, 2);
-                } else if (result.status === 'not_found') {
-                    addLog(`❌ Analysis ${requestId} not found`, 'error');
-                } else {
-                    // Still running, poll again
-                    addLog(`⏳ Analysis still running... Status: ${result.status || 'unknown'}`, 'warning');
-                    setTimeout(() => pollAnalysisResults(requestId), 2000);
-                }
-            }
-            
-            async function checkHealth() {
-                addLog('💓 Checking system health...', 'info');
-                const result = await apiCall('/health');
-                document.getElementById('results').textContent = JSON.stringify(result, null, 2);
-                
-                if (result.status === 'healthy') {
-                    addLog('✅ System is healthy', 'info');
-                } else {
-                    addLog('⚠️ System health issues detected', 'warning');
-                }
-            }
-            
-            async function sendChatMessage() {
-                const message = document.getElementById('chatInput').value;
-                if (!message.trim()) {
-                    addLog('⚠️ Please enter a chat message', 'warning');
-                    return;
-                }
-                
-                addLog(`💬 Sending chat message: "${message}"`, 'info');
-                const result = await apiCall('/chat', 'POST', { message });
-                
-                if (result.response) {
-                    document.getElementById('chatResponse').innerHTML = `
-                        <strong>🤖 Response:</strong><br>${result.response}<br>
-                        <strong>💡 Suggestions:</strong> ${result.suggestions ? result.suggestions.join(', ') : 'None'}
-                    `;
-                    
-                    addLog('✅ Chat response received', 'info');
-                    
-                    if (result.analysis_triggered) {
-                        addLog(`🚀 Analysis triggered for: ${result.client_names.join(', ')}`, 'info');
-                    }
-                } else {
-                    addLog('❌ No response from chat service', 'error');
-                }
-                
-                // Clear input
-                document.getElementById('chatInput').value = '';
-            }
-            
-            // Initialize
-            addLog('🚀 Windows Log Gathering Agent initialized', 'info');
-            addLog('📡 Ready for commands', 'info');
-            
-            // Auto-refresh system status
-            setInterval(async () => {
-                try {
-                    const health = await apiCall('/health', 'GET', null, false);
-                    const llmStatusElement = document.getElementById('llmStatus');
-                    
-                    if (health.status === 'healthy') {
-                        llmStatusElement.innerHTML = '<span class="status-indicator status-success"></span>Connected';
-                    } else {
-                        llmStatusElement.innerHTML = '<span class="status-indicator status-error"></span>Error';
-                    }
-                } catch (error) {
-                    // Ignore silent health check errors
-                }
-            }, 10000); // Check every 10 seconds
-        </script>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+    return FileResponse(INDEX_HTML_PATH, media_type="text/html")
+
+
+# Field names hoisted once so results are turned into plain dicts without copying __dict__
+_CLIENT_RESULT_FIELDS = tuple(f.name for f in fields(ClientAnalysisResult))
+_LOG_ANALYSIS_FIELDS = tuple(f.name for f in fields(LogAnalysisResult))
+
+
+def _dataclass_row(obj: Any, field_names: Tuple[str, ...]) -> Dict[str, Any]:
+    """Shallow dict of a dataclass instance's declared fields."""
+    return {name: getattr(obj, name) for name in field_names}
+
+
+def _build_result_payload(request_id: str, analysis_results: List[ClientAnalysisResult],
+                          include_summary: bool, client_names: List[str]) -> Dict[str, Any]:
+    """Turn analysis results into the completed cache entry, one row per client."""
+    results_list = []
+    for result in analysis_results:
+        client_entry = _dataclass_row(result, _CLIENT_RESULT_FIELDS)
+        client_entry["log_analyses"] = [_dataclass_row(analysis, _LOG_ANALYSIS_FIELDS) for analysis in result.log_analyses]
+        results_list.append(client_entry)
+    
+    result_data = {
+        "request_id": request_id,
+        "status": "completed",
+        "clients_analyzed": client_names,
+        "results": results_list,
+        "timestamp": datetime.now()
+    }
+    
+    if include_summary:
+        result_data["summary"] = generate_multi_client_summary(analysis_results)
+    
+    return result_data
 
 
 # Background task functions
 async def run_analysis(request_id: str, client_names: List[str], include_summary: bool, force_refresh: bool):
     """Background task to run log analysis."""
+    # Step events are collected as (name, payload, elapsed_ms) and emitted as one trace at the end
+    steps: List[Tuple[str, Dict[str, Any], float]] = []
+    started = time.perf_counter()
+    
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+    
     try:
         logger.info("=== BACKGROUND ANALYSIS STARTED ===", 
                    request_id=request_id, clients=client_names)
@@ -722,67 +806,61 @@ async def run_analysis(request_id: str, client_names: List[str], include_summary
             "timestamp": datetime.now(),
             "progress": "Starting analysis..."
         }
-        logger.info("Step 1: Cache entry initialized", request_id=request_id)
-        
-        # Step 2: Collect logs
-        logger.info("Step 2: Starting log collection", request_id=request_id)
-        log_collections = await log_collector.collect_multiple_clients(client_names)
-        logger.info("Step 2: Log collection completed", 
-                   request_id=request_id, 
-                   collections_count=len(log_collections))
-        
-        # Update cache with collection progress
-        analysis_cache[request_id]["progress"] = "Log collection completed, starting LLM analysis..."
-        
-        # Step 3: Analyze logs
-        logger.info("Step 3: Starting LLM analysis", request_id=request_id)
-        analysis_results = await log_analyzer.analyze_multiple_clients(log_collections)
-        logger.info("Step 3: LLM analysis completed", 
-                   request_id=request_id,
-                   analysis_count=len(analysis_results))
-        
-        # Step 4: Store results
-        logger.info("Step 4: Storing analysis results", request_id=request_id)
-        result_data = {
-            "request_id": request_id,
-            "status": "completed",
-            "clients_analyzed": client_names,
-            "results": [result.__dict__ for result in analysis_results],
-            "timestamp": datetime.now()
-        }
+        _publish_analysis(request_id, analysis_cache[request_id])
+        steps.append(("cache_initialized", {}, elapsed_ms()))
+        
+        # Steps 2-3: Collect and analyze each client as a pipeline, so a client's LLM analysis
+        # starts as soon as its own logs are in rather than after the slowest collection
+        analysis_cache[request_id]["progress"] = "Collecting and analyzing logs..."
+        _publish_analysis(request_id, analysis_cache[request_id])
+        steps.append(("pipeline_started", {}, elapsed_ms()))
+        
+        # Created per call so they bind to the running event loop
+        collect_semaphore = asyncio.Semaphore(settings.max_concurrent_collections)
+        llm_semaphore = asyncio.Semaphore(settings.max_concurrent_analyses)
+        
+        async def collect_and_analyze(client_name: str) -> ClientAnalysisResult:
+            # The *_multiple_* helpers turn exceptions into failed collection/analysis results
+            async with collect_semaphore:
+                collections = await log_collector.collect_multiple_clients([client_name])
+            async with llm_semaphore:
+                results = await log_analyzer.analyze_multiple_clients(collections, use_cache=not force_refresh)
+            return results[0]
+        
+        analysis_results = await asyncio.gather(*[collect_and_analyze(name) for name in client_names])
+        steps.append(("pipeline_completed", {"analysis_count": len(analysis_results)}, elapsed_ms()))
+        
+        # Step 4: Build the payload in a worker thread so large fleets don't stall other
+        # requests; only the cache writes happen on the event loop
+        result_data = await asyncio.to_thread(
+            _build_result_payload, request_id, analysis_results, include_summary, client_names
+        )
+        steps.append(("payload_built", {"summary_included": include_summary}, elapsed_ms()))
         
-        if include_summary:
-            logger.info("Step 4.1: Generating summary", request_id=request_id)
-            result_data["summary"] = generate_multi_client_summary(analysis_results)
+        # The client rows are shared by reference between the aggregate entry and each client's slot
+        for result, client_entry in zip(analysis_results, result_data["results"]):
+            analysis_cache[result.client_name] = client_entry
         
         # Cache results
-        logger.info("Step 4.2: Caching main results", request_id=request_id)
         analysis_cache[request_id] = result_data
+        _publish_analysis(request_id, result_data)
         
-        # Also cache individual client results
-        logger.info("Step 4.3: Caching individual client results", request_id=request_id)
-        for result in analysis_results:
-            analysis_cache[result.client_name] = {
-                "client_name": result.client_name,
-                "hostname": result.hostname,
-                "overall_status": result.overall_status,
-                "summary": result.summary,
-                "action_items": result.action_items,
-                "timestamp": result.timestamp,
-                "log_analyses": [analysis.__dict__ for analysis in result.log_analyses]
-            }
+        steps.append(("results_cached", {}, elapsed_ms()))
         
         logger.info("=== BACKGROUND ANALYSIS COMPLETED SUCCESSFULLY ===", 
                    request_id=request_id, 
                    clients_count=len(analysis_results),
-                   cache_entries=len(analysis_cache))
+                   cache_entries=len(analysis_cache),
+                   summary_included=include_summary,
+                   steps=steps)
         
     except Exception as e:
         logger.error("=== BACKGROUND ANALYSIS FAILED ===", 
                     request_id=request_id, 
                     error=str(e),
                     error_type=type(e).__name__,
-                    traceback=str(e.__traceback__))
+                    exc_info=True,
+                    steps=steps)
         
         # Store error result with detailed information
         analysis_cache[request_id] = {
@@ -793,31 +871,57 @@ async def run_analysis(request_id: str, client_names: List[str], include_summary
             "clients_analyzed": client_names,
             "timestamp": datetime.now()
         }
+        _publish_analysis(request_id, analysis_cache[request_id])
         
         # Also log current cache state for debugging
         logger.error("Current cache state after error", 
-                    cache_keys=list(analysis_cache.keys()),
                     cache_size=len(analysis_cache))
 
 
+# Chat intents by keyword, checked in order; phrases only when no single word matched
+INTENT_KEYWORDS = {
+    "analyze": frozenset({"analyze", "check", "scan", "logs"}),
+    "status": frozenset({"status", "health", "list", "clients"}),
+    "help": frozenset({"help"}),
+}
+INTENT_PHRASES = (("help", ("what can", "how do")),)
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _classify_intent(message_lower: str) -> Optional[str]:
+    """Return the chat intent for a lowercased message, or None for a general reply."""
+    tokens = set(_WORD_RE.findall(message_lower))
+    for intent, keywords in INTENT_KEYWORDS.items():
+        if tokens & keywords:
+            return intent
+    for intent, phrases in INTENT_PHRASES:
+        if any(phrase in message_lower for phrase in phrases):
+            return intent
+    return None
+
+
 async def process_chat_message(message: str, context: Optional[Dict], background_tasks: BackgroundTasks) -> ChatResponse:
     """Process chat message and return appropriate response."""
     message_lower = message.lower()
+    intent = _classify_intent(message_lower)
     
     # Analyze intent
-    if any(word in message_lower for word in ["analyze", "check", "scan", "logs"]):
+    if intent == "analyze":
         # Extract client names if mentioned
         try:
-            machines_config = settings.load_machines_config()
-            mentioned_clients = []
+            machines_config = _cached_machines_config()
             
-            for client in machines_config.clients:
-                if client.name.lower() in message_lower or client.hostname.lower() in message_lower:
-                    mentioned_clients.append(client.name)
+            # One scan of the message against every client name and hostname
+            lookup, pattern = _client_mention_index()
+            mentioned_clients = []
+            if pattern is not None:
+                mentioned_clients = list(dict.fromkeys(
+                    lookup[match.group()] for match in pattern.finditer(message_lower)
+                ))
             
             if mentioned_clients:
                 # Start analysis for mentioned clients
-                request_id = f"chat_{int(datetime.now().timestamp())}"
+                request_id = _next_request_id("chat")
                 background_tasks.add_task(run_analysis, request_id, mentioned_clients, True, True)
                 
                 return ChatResponse(
@@ -849,7 +953,7 @@ async def process_chat_message(message: str, context: Optional[Dict], background
                 analysis_triggered=False
             )
     
-    elif any(word in message_lower for word in ["status", "health", "list", "clients"]):
+    elif intent == "status":
         # Status inquiry
         return ChatResponse(
             response="I can show you the status of all configured client machines. Would you like me to list them or check their current analysis status?",
@@ -861,7 +965,7 @@ async def process_chat_message(message: str, context: Optional[Dict], background
             analysis_triggered=False
         )
     
-    elif any(word in message_lower for word in ["help", "what can", "how do"]):
+    elif intent == "help":
         # Help request
         return ChatResponse(
             response="I'm your Windows deployment log analysis assistant! I can:\n• Analyze SCCM and Windows Update logs\n• Check specific clients for issues\n• Provide troubleshooting recommendations\n• Show system status and health",
@@ -886,14 +990,16 @@ async def process_chat_message(message: str, context: Optional[Dict], background
         )
 
 
+@lru_cache(maxsize=1024)
+def _summary_text(total_clients: int, healthy_clients: int, issue_clients: int, critical_clients: int) -> str:
+    """Render the multi-client summary for one status distribution."""
+    return f"Analysis Summary: {healthy_clients}/{total_clients} clients healthy, {issue_clients} with issues, {critical_clients} critical. Most common problems involve Windows Update and SCCM deployment failures."
+
+
 def generate_multi_client_summary(results: List[ClientAnalysisResult]) -> str:
     """Generate summary for multiple client analysis."""
-    total_clients = len(results)
-    healthy_clients = len([r for r in results if r.overall_status == "healthy"])
-    issue_clients = len([r for r in results if r.overall_status == "issues"])
-    critical_clients = len([r for r in results if r.overall_status == "critical"])
-    
-    return f"Analysis Summary: {healthy_clients}/{total_clients} clients healthy, {issue_clients} with issues, {critical_clients} critical. Most common problems involve Windows Update and SCCM deployment failures."
+    status_counts = Counter(r.overall_status for r in results)
+    return _summary_text(len(results), status_counts["healthy"], status_counts["issues"], status_counts["critical"])
 
 
 if __name__ == "__main__":
@@ -4,9 +4,10 @@ Command-line interface for the Windows Log Gathering Agent.
 """
 
 import asyncio
-import json
+from collections import Counter
 from pathlib import Path
 from typing import List, Optional
+import orjson
 import typer
 from rich.console import Console
 from rich.table import Table
@@ -19,6 +20,14 @@ from .config.settings import Settings
 from .core.log_collector import WindowsLogCollector
 from .core.llm_analyzer import WindowsLogAnalyzer
 
+# The MCP clients are only needed by test-connection; keep the CLI usable without them
+try:
+    from .mcp_clients.smb_client import SMBMCPClient
+    from .mcp_clients.powershell_client import PowerShellMCPClient
+except ImportError as e:
+    SMBMCPClient = PowerShellMCPClient = None
+    _mcp_import_error = e
+
 # Initialize CLI
 app = typer.Typer(
     name="loggatheringagent",
@@ -67,15 +76,12 @@ def list_clients():
         table.add_column("Log Sources", style="magenta")
         
         for client in machines_config.clients:
-            log_count = sum(len(paths) for paths in client.log_paths.values())
-            log_count += len(client.powershell_commands)
-            
             table.add_row(
                 client.name,
                 client.hostname,
                 client.ip,
                 client.credentials,
-                str(log_count)
+                str(client._log_source_count)
             )
         
         console.print(table)
@@ -102,8 +108,8 @@ def analyze(
             # Determine which clients to analyze
             if clients:
                 # Validate client names
-                available_clients = {client.name for client in machines_config.clients}
-                invalid_clients = set(clients) - available_clients
+                available_clients = dict.fromkeys(client.name for client in machines_config.clients)
+                invalid_clients = [name for name in clients if name not in available_clients]
                 if invalid_clients:
                     console.print(f"❌ Unknown clients: {', '.join(invalid_clients)}", style="red")
                     console.print(f"Available clients: {', '.join(available_clients)}")
@@ -122,7 +128,7 @@ def analyze(
             log_collector = WindowsLogCollector(settings)
             log_analyzer = WindowsLogAnalyzer(settings)
             
-            # Collect logs with progress indicator
+            # Collect and analyze under one progress display so its render thread starts once
             with Progress(
                 SpinnerColumn(),
                 TextColumn("[progress.description]{task.description}"),
@@ -131,21 +137,18 @@ def analyze(
                 collect_task = progress.add_task("Collecting logs...", total=None)
                 log_collections = await log_collector.collect_multiple_clients(target_clients)
                 progress.update(collect_task, description="✅ Log collection completed")
-            
-            # Show collection results
-            if verbose:
-                for collection in log_collections:
-                    status = "✅" if collection.success else "❌"
-                    console.print(f"{status} {collection.client_name}: {len(collection.log_results)} log sources")
-            
-            # Analyze logs with progress indicator
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console
-            ) as progress:
+                
+                # Show collection results
+                if verbose:
+                    for collection in log_collections:
+                        status = "✅" if collection.success else "❌"
+                        console.print(f"{status} {collection.client_name}: {len(collection.log_results)} log sources")
+                
                 analyze_task = progress.add_task("Analyzing logs with LLM...", total=None)
-                analysis_results = await log_analyzer.analyze_multiple_clients(log_collections)
+                try:
+                    analysis_results = await log_analyzer.analyze_multiple_clients(log_collections)
+                finally:
+                    await log_analyzer.aclose()
                 progress.update(analyze_task, description="✅ Analysis completed")
             
             # Display results
@@ -185,9 +188,10 @@ def analyze(
             # Generate summary
             if summary:
                 total_clients = len(analysis_results)
-                healthy = len([r for r in analysis_results if r.overall_status == "healthy"])
-                issues = len([r for r in analysis_results if r.overall_status == "issues"])
-                critical = len([r for r in analysis_results if r.overall_status == "critical"])
+                status_counts = Counter(r.overall_status for r in analysis_results)
+                healthy = status_counts["healthy"]
+                issues = status_counts["issues"]
+                critical = status_counts["critical"]
                 
                 summary_panel = f"""
 **Total Clients Analyzed**: {total_clients}
@@ -204,34 +208,17 @@ def analyze(
             
             # Save to file if requested
             if output:
-                output_data = {
-                    "timestamp": analysis_results[0].timestamp.isoformat(),
-                    "clients_analyzed": target_clients,
-                    "results": [
-                        {
-                            "client_name": r.client_name,
-                            "hostname": r.hostname,
-                            "overall_status": r.overall_status,
-                            "summary": r.summary,
-                            "action_items": r.action_items,
-                            "log_analyses": [
-                                {
-                                    "source": la.source,
-                                    "analysis": la.analysis,
-                                    "issues_found": la.issues_found,
-                                    "recommendations": la.recommendations,
-                                    "severity": la.severity,
-                                    "confidence": la.confidence
-                                }
-                                for la in r.log_analyses
-                            ]
-                        }
-                        for r in analysis_results
-                    ]
-                }
-                
-                with open(output, 'w', encoding='utf-8') as f:
-                    json.dump(output_data, f, indent=2, ensure_ascii=False, default=str)
+                # Streamed one client record at a time so only one is serialized in memory
+                json_options = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+                with open(output, 'wb', buffering=1024 * 1024) as f:
+                    f.write(b'{\n"timestamp": ' + orjson.dumps(analysis_results[0].timestamp.isoformat())
+                            + b',\n"clients_analyzed": ' + orjson.dumps(target_clients)
+                            + b',\n"results": [\n')
+                    for i, r in enumerate(analysis_results):
+                        if i:
+                            f.write(b',\n')
+                        f.write(orjson.dumps(_output_record(r), option=json_options, default=str))
+                    f.write(b'\n]\n}\n')
                 
                 console.print(f"💾 Results saved to: {output}")
             
@@ -248,6 +235,28 @@ def analyze(
     asyncio.run(run_analysis())
 
 
+def _output_record(r) -> dict:
+    """Build the --output JSON record for one client's analysis result."""
+    return {
+        "client_name": r.client_name,
+        "hostname": r.hostname,
+        "overall_status": r.overall_status,
+        "summary": r.summary,
+        "action_items": r.action_items,
+        "log_analyses": [
+            {
+                "source": la.source,
+                "analysis": la.analysis,
+                "issues_found": la.issues_found,
+                "recommendations": la.recommendations,
+                "severity": la.severity,
+                "confidence": la.confidence
+            }
+            for la in r.log_analyses
+        ]
+    }
+
+
 @app.command()
 def test_connection(
     client: str = typer.Argument(..., help="Client name to test"),
@@ -276,54 +285,68 @@ def test_connection(
                 console.print(f"❌ Credentials '{client_config.credentials}' not found", style="red")
                 raise typer.Exit(1)
             
+            if SMBMCPClient is None:
+                console.print(f"❌ MCP client dependencies are not installed: {_mcp_import_error}", style="red")
+                raise typer.Exit(1)
+            
             console.print(f"🔍 Testing connectivity to {client_config.name} ({client_config.hostname})")
             
-            # Test SMB
-            if test_smb:
-                from .mcp_clients.smb_client import SMBMCPClient
-                
-                with console.status("Testing SMB connectivity..."):
-                    try:
-                        async with SMBMCPClient() as smb_client:
-                            result = await smb_client.list_directory(
-                                hostname=client_config.hostname,
-                                username=cred_config.username,
-                                password=cred_config.password,
-                                dir_path="C$/Windows",
-                                domain=cred_config.domain
-                            )
-                            
-                            if result["success"]:
-                                console.print("✅ SMB connection successful", style="green")
-                            else:
-                                console.print(f"❌ SMB connection failed: {result['error']}", style="red")
-                                
-                    except Exception as e:
-                        console.print(f"❌ SMB test failed: {e}", style="red")
+            # Both probes are independent round trips, so run them concurrently and
+            # print their outcomes once both are done
+            async def smb_probe():
+                try:
+                    async with SMBMCPClient() as smb_client:
+                        result = await smb_client.list_directory(
+                            hostname=client_config.hostname,
+                            username=cred_config.username,
+                            password=cred_config.password,
+                            dir_path="C$/Windows",
+                            domain=cred_config.domain
+                        )
+                        
+                        if result["success"]:
+                            return [("✅ SMB connection successful", "green")]
+                        return [(f"❌ SMB connection failed: {result['error']}", "red")]
+                        
+                except Exception as e:
+                    return [(f"❌ SMB test failed: {e}", "red")]
             
-            # Test PowerShell
+            async def powershell_probe():
+                try:
+                    async with PowerShellMCPClient() as ps_client:
+                        result = await ps_client.execute_powershell(
+                            hostname=client_config.hostname,
+                            username=cred_config.username,
+                            password=cred_config.password,
+                            command="Write-Output 'Connection test successful'"
+                        )
+                        
+                        if result["success"]:
+                            lines = [("✅ PowerShell connection successful", "green")]
+                            if result["stdout"]:
+                                lines.append((f"Response: {result['stdout'].strip()}", None))
+                            return lines
+                        return [(f"❌ PowerShell connection failed: {result['stderr']}", "red")]
+                        
+                except Exception as e:
+                    return [(f"❌ PowerShell test failed: {e}", "red")]
+            
+            probes = []
+            if test_smb:
+                probes.append(smb_probe())
             if test_powershell:
-                from .mcp_clients.powershell_client import PowerShellMCPClient
+                probes.append(powershell_probe())
+            
+            if probes:
+                with console.status("Testing connectivity..."):
+                    outcomes = await asyncio.gather(*probes, return_exceptions=True)
                 
-                with console.status("Testing PowerShell connectivity..."):
-                    try:
-                        async with PowerShellMCPClient() as ps_client:
-                            result = await ps_client.execute_powershell(
-                                hostname=client_config.hostname,
-                                username=cred_config.username,
-                                password=cred_config.password,
-                                command="Write-Output 'Connection test successful'"
-                            )
-                            
-                            if result["success"]:
-                                console.print("✅ PowerShell connection successful", style="green")
-                                if result["stdout"]:
-                                    console.print(f"Response: {result['stdout'].strip()}")
-                            else:
-                                console.print(f"❌ PowerShell connection failed: {result['stderr']}", style="red")
-                                
-                    except Exception as e:
-                        console.print(f"❌ PowerShell test failed: {e}", style="red")
+                for outcome in outcomes:
+                    if isinstance(outcome, BaseException):
+                        console.print(f"❌ Test failed: {outcome}", style="red")
+                        continue
+                    for message, style in outcome:
+                        console.print(message, style=style)
             
         except Exception as e:
             console.print(f"❌ Test failed: {e}", style="red")
@@ -340,28 +363,29 @@ def config(
 ):
     """Manage configuration."""
     
-    if show or (not edit and not validate):
+    show = show or (not edit and not validate)
+    
+    # Parsed once for both --show and --validate
+    if show or validate:
         try:
             machines_config = settings.load_machines_config()
-            
-            console.print("📋 Current Configuration:")
-            console.print(f"Config file: {settings.config_file}")
-            console.print(f"Clients: {len(machines_config.clients)}")
-            console.print(f"Credential sets: {len(machines_config.credentials)}")
-            console.print(f"LLM endpoint: {machines_config.llm_config.endpoint}")
-            console.print(f"LLM model: {machines_config.llm_config.model}")
-            
         except Exception as e:
-            console.print(f"❌ Error loading configuration: {e}", style="red")
+            if validate:
+                console.print(f"❌ Configuration validation failed: {e}", style="red")
+            else:
+                console.print(f"❌ Error loading configuration: {e}", style="red")
             raise typer.Exit(1)
     
+    if show:
+        console.print("📋 Current Configuration:")
+        console.print(f"Config file: {settings.config_file}")
+        console.print(f"Clients: {len(machines_config.clients)}")
+        console.print(f"Credential sets: {len(machines_config.credentials)}")
+        console.print(f"LLM endpoint: {machines_config.llm_config.endpoint}")
+        console.print(f"LLM model: {machines_config.llm_config.model}")
+    
     if validate:
-        try:
-            machines_config = settings.load_machines_config()
-            console.print("✅ Configuration is valid", style="green")
-        except Exception as e:
-            console.print(f"❌ Configuration validation failed: {e}", style="red")
-            raise typer.Exit(1)
+        console.print("✅ Configuration is valid", style="green")
     
     if edit:
         import subprocess
@@ -1,9 +1,15 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from pydantic_settings import BaseSettings
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import yaml
 from pathlib import Path
 
+# Prefer the libyaml-backed C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 
 class CredentialConfig(BaseModel):
     username: str
@@ -18,6 +24,12 @@ class ClientConfig(BaseModel):
     credentials: str
     log_paths: Dict[str, List[str]]
     powershell_commands: List[str]
+    
+    # Log files plus PowerShell commands, counted once when the config is loaded
+    _log_source_count: int = PrivateAttr(default=0)
+    
+    def model_post_init(self, __context) -> None:
+        self._log_source_count = sum(len(paths) for paths in self.log_paths.values()) + len(self.powershell_commands)
 
 
 class LLMConfig(BaseModel):
@@ -26,6 +38,15 @@ class LLMConfig(BaseModel):
     max_tokens: int = 4000
     temperature: float = 0.1
     system_prompt: str
+    # Upper bound on LLM requests in flight, and an optional provider rate limit
+    concurrency: int = 4
+    requests_per_minute: Optional[int] = None
+    # Logs packed into one analysis request; 1 sends every log on its own
+    batch_size: int = 1
+    # Receive completions as server-sent event deltas instead of one response body
+    stream: bool = False
+    # Token budget for a whole analysis prompt; log content gets what the instructions leave
+    max_input_tokens: int = 4000
 
 
 class MachinesConfig(BaseModel):
@@ -34,6 +55,10 @@ class MachinesConfig(BaseModel):
     llm_config: LLMConfig
 
 
+# Parsed machines configs keyed by file path, reused until the file's mtime changes
+_config_cache: Dict[str, Tuple[int, MachinesConfig]] = {}
+
+
 class Settings(BaseSettings):
     config_file: str = Field(default="src/loggatheringagent/config/machines.yaml")
     log_tail_lines: int = Field(default=100)
@@ -41,6 +66,25 @@ class Settings(BaseSettings):
     api_port: int = Field(default=8000)
     debug: bool = Field(default=False)
     
+    # Browser origins allowed to call the API (the Vite dev server and the API's own page)
+    cors_origins: List[str] = Field(default=[
+        "http://localhost:3000",
+        "http://127.0.0.1:3000",
+        "http://localhost:8000",
+        "http://127.0.0.1:8000",
+    ])
+    
+    # Upper bound on concurrent client collections and file reads per client
+    max_concurrent_collections: int = Field(default=8)
+    
+    # Upper bound on clients analyzed by the LLM at the same time
+    max_concurrent_analyses: int = Field(default=4)
+    
+    # On-disk cache of LLM responses for identical prompts (model, temperature and prompt)
+    llm_cache_enabled: bool = Field(default=True)
+    llm_cache_dir: str = Field(default=".cache/llm_responses")
+    llm_cache_ttl: int = Field(default=24 * 3600)
+    
     # MCP Server configurations
     powershell_mcp_port: int = Field(default=8001)
     smb_mcp_port: int = Field(default=8002)
@@ -50,15 +94,24 @@ class Settings(BaseSettings):
         env_file = ".env"
 
     def load_machines_config(self) -> MachinesConfig:
-        """Load machines configuration from YAML file."""
+        """Load machines configuration from YAML file, cached until the file changes."""
         config_path = Path(self.config_file)
-        if not config_path.exists():
+        try:
+            mtime_ns = config_path.stat().st_mtime_ns
+        except FileNotFoundError:
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
         
+        cache_key = str(config_path)
+        cached = _config_cache.get(cache_key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        
         with open(config_path, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=_YamlLoader)
         
-        return MachinesConfig(**data)
+        machines_config = MachinesConfig(**data)
+        _config_cache[cache_key] = (mtime_ns, machines_config)
+        return machines_config
 
 
 # Global settings instance
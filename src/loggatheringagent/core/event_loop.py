@@ -0,0 +1,24 @@
+"""
+Event loop selection for the command-line entry points.
+"""
+
+import asyncio
+import sys
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on a libuv-based loop when one is installed, else on asyncio's default.
+
+    winloop is used on Windows, where uvloop is not supported, and uvloop elsewhere.
+    """
+    try:
+        if sys.platform == "win32":
+            import winloop as loop_module
+        else:
+            import uvloop as loop_module
+    except ImportError:
+        return asyncio.run(main)
+    return loop_module.run(main)
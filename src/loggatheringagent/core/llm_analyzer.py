@@ -3,18 +3,41 @@ LLM analyzer for processing Windows deployment logs and identifying issues.
 """
 
 import asyncio
+import hashlib
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import re
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import httpx
+import orjson
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 from ..config.settings import Settings, LLMConfig
 from .log_collector import ClientLogCollection, LogCollectionResult
 
 logger = logging.getLogger(__name__)
 
+_JSON_DECODER = json.JSONDecoder()
+
+# Quoted JSON string (unrolled loop, so no nested backtracking) and a backslash not already escaped.
+# A \" followed by , } ] or : is a raw path's trailing backslash closing the string
+# (e.g. "C:\Windows\Logs\", ...), not an escaped quote
+_JSON_STRING_RE = re.compile(r'"([^"\\]*(?:\\(?:"(?!\s*[,}\]:])|[^"])[^"\\]*)*\\?)"')
+_LONE_BACKSLASH_RE = re.compile(r'(?<!\\)\\(?![\\"])')
+# JSONDecodeError messages caused by unescaped backslashes (e.g. raw Windows paths)
+_BACKSLASH_ERROR_PREFIXES = ("Invalid \\escape", "Invalid \\uXXXX escape", "Unterminated string")
+
 
 @dataclass
 class LogAnalysisResult:
@@ -48,6 +71,65 @@ class ClientAnalysisResult:
             self.timestamp = datetime.now()
 
 
+# Per log type: display name and the focus instructions for the system prompt
+LOG_TYPE_INSTRUCTIONS = {
+    "wuahandler": ("SCCM Windows Update Agent Handler", """
+            Focus on:
+            - Windows Update installation failures
+            - Update agent errors and warnings
+            - Communication issues with WSUS/Windows Update
+            - Installation progress and completion status
+            """),
+    "cas": ("SCCM Content Access Service", """
+            Focus on:
+            - Content download failures
+            - Distribution point connectivity issues
+            - Content validation errors
+            - Cache management problems
+            """),
+    "cbs": ("Component-Based Servicing (CBS.log)", """
+            Focus specifically on:
+            - Package installation failures with exact package names, versions, and error codes
+            - TrustedInstaller service operations and permission errors
+            - Component store corruption with specific file paths and manifest issues
+            - SxS assembly conflicts with detailed version information
+            - System file corruption with specific .dll/.exe/.sys file names
+            - Dependency resolution problems with component hierarchies
+            - DISM operation failures and servicing stack issues
+            - WinSxS store problems and cleanup operations
+            - Registry operations and permissions errors
+            - File system operations and access denied errors
+            
+            Include specific details:
+            - Error codes (0x hex values, HRESULT codes)
+            - File paths and registry keys
+            - Package GUIDs and version numbers
+            - Timestamps and operation sequences
+            - Service names and process IDs"""),
+    "windowsupdate": ("Windows Update Log", """
+            Focus on:
+            - Update download and installation errors
+            - Agent communication issues
+            - Reboot requirements and failures
+            - Update rollback scenarios
+            """),
+    "eventlog": ("Windows Event Log", """
+            Focus on:
+            - Critical system events
+            - Application and service failures
+            - Security-related events
+            - Hardware and driver issues
+            """),
+    "system": ("Windows System Log", """
+            Focus on:
+            - Error and warning messages
+            - System component failures
+            - Configuration issues
+            - Performance problems
+            """),
+}
+
+
 class WindowsLogAnalyzer:
     """Analyzes Windows deployment logs using LLM."""
     
@@ -55,9 +137,129 @@ class WindowsLogAnalyzer:
         self.settings = settings
         self.machines_config = settings.load_machines_config()
         self.llm_config = self.machines_config.llm_config
+        
+        # Static system prompts per log type, byte-identical across calls so providers can cache the prefix
+        self._system_prompts = {
+            key: self._build_system_prompt(log_type, specific_instructions)
+            for key, (log_type, specific_instructions) in LOG_TYPE_INSTRUCTIONS.items()
+        }
+        self._batch_system_prompt = self._build_batch_system_prompt()
+        
+        # Log content is capped by tokens left after each static prompt; a batch shares what
+        # is left after the batch prompt. The tokenizer is loaded off the event loop before the
+        # first analysis, since tiktoken may download its BPE file; without it the cap falls
+        # back to the old 8000 characters
+        self._encoding = None
+        self._encoding_loaded = False
+        self._encoding_task: Optional[asyncio.Future] = None
+        self._content_token_budgets: Dict[str, int] = {}
+        self._batch_token_budget = 0
+        
+        # One pooled client for every LLM call so connections (and TLS sessions) are reused
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=32)
+        )
+        
+        # Identical prompts (e.g. the same rotated log on several clients) reuse the stored response
+        self._response_cache = None
+        if settings.llm_cache_enabled:
+            if diskcache is None:
+                logger.warning("diskcache not installed, LLM response cache disabled")
+            else:
+                self._response_cache = diskcache.Cache(settings.llm_cache_dir, size_limit=2**30)
+        
+        # Created on first use so they bind to the event loop that runs the analysis
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._next_request_at = 0.0
+    
+    def _load_encoding(self):
+        """Load the tokenizer and per-log-type token budgets, once."""
+        self._encoding_loaded = True
+        if tiktoken is None:
+            logger.warning("tiktoken not installed, log content capped by characters instead of tokens")
+            return
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(self.llm_config.model)
+            except KeyError:
+                # Models tiktoken doesn't know get a generic tokenizer
+                encoding = tiktoken.get_encoding("cl100k_base")
+            self._content_token_budgets = {
+                key: max(self.llm_config.max_input_tokens - len(encoding.encode(system_prompt)), 256)
+                for key, system_prompt in self._system_prompts.items()
+            }
+            self._batch_token_budget = (
+                self.llm_config.max_input_tokens - len(encoding.encode(self._batch_system_prompt))
+            )
+        except Exception as e:
+            # e.g. the BPE file can't be downloaded while offline
+            logger.warning(f"tiktoken encoding unavailable ({e}), log content capped by characters instead of tokens")
+            return
+        self._encoding = encoding
+    
+    async def load_encoding(self):
+        """Load the tokenizer in a worker thread, once; later calls wait for the same load."""
+        if self._encoding_loaded:
+            return
+        if self._encoding_task is None:
+            self._encoding_task = asyncio.ensure_future(asyncio.to_thread(self._load_encoding))
+        await asyncio.shield(self._encoding_task)
+    
+    def _truncate_content(self, content: str, log_key: str, batch_size: int = 1) -> str:
+        """Cap log content at the token budget left for its log type, or its share of a batch."""
+        if not self._encoding_loaded:
+            # Only reached by callers that skipped load_encoding()
+            self._load_encoding()
+        if self._encoding is None:
+            return content[:8000 // batch_size]
+        
+        if batch_size > 1:
+            budget = max(self._batch_token_budget // batch_size, 256)
+        else:
+            budget = self._content_token_budgets[log_key]
+        # Tokens rarely span more than 10 characters, so slicing first bounds the encoding
+        # cost for huge logs without cutting below the budget in practice
+        tokens = self._encoding.encode(content[:budget * 10], disallowed_special=())
+        if len(tokens) <= budget:
+            return content[:budget * 10]
+        return self._encoding.decode(tokens[:budget])
+    
+    async def aclose(self):
+        """Close the pooled HTTP client and the response cache."""
+        await self._http.aclose()
+        if self._response_cache is not None:
+            self._response_cache.close()
+    
+    def _cache_key(self, prompt: str, system_prompt: Optional[str]) -> str:
+        """Content address for a prompt under the current model settings."""
+        key_material = f"{self.llm_config.model}|{self.llm_config.temperature}|{self.llm_config.max_tokens}|{system_prompt or ''}|{prompt}"
+        return hashlib.blake2b(key_material.encode('utf-8'), digest_size=16).hexdigest()
+    
+    async def _wait_for_rate_limit(self):
+        """Space requests out to honour llm_config.requests_per_minute, if set."""
+        rpm = self.llm_config.requests_per_minute
+        if not rpm:
+            return
+        
+        if self._rate_lock is None:
+            self._rate_lock = asyncio.Lock()
+        async with self._rate_lock:
+            loop_time = asyncio.get_running_loop().time()
+            delay = self._next_request_at - loop_time
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_request_at = max(loop_time, self._next_request_at) + 60.0 / rpm
     
-    async def analyze_client_logs(self, log_collection: ClientLogCollection) -> ClientAnalysisResult:
-        """Analyze all logs from a client using LLM."""
+    async def analyze_client_logs(self, log_collection: ClientLogCollection,
+                                  use_cache: bool = True) -> ClientAnalysisResult:
+        """Analyze all logs from a client using LLM.
+        
+        use_cache=False skips cached LLM responses (e.g. for a forced refresh); the fresh
+        responses still replace the cached ones.
+        """
         logger.info(f"Starting LLM analysis for client: {log_collection.client_name}")
         
         if not log_collection.success:
@@ -70,25 +272,18 @@ class WindowsLogAnalyzer:
                 action_items=["Fix log collection issues before analysis"]
             )
         
-        # Analyze each log source
-        log_analyses = []
-        for log_result in log_collection.log_results:
-            if log_result.success and log_result.content.strip():
-                analysis = await self._analyze_single_log(log_result)
-                log_analyses.append(analysis)
-            else:
-                # Create analysis for failed log collection
-                log_analyses.append(LogAnalysisResult(
-                    source=log_result.source,
-                    analysis=f"Failed to collect log: {log_result.error}",
-                    issues_found=["Log collection failed"],
-                    recommendations=["Check file permissions and network connectivity"],
-                    severity="error",
-                    confidence=1.0
-                ))
+        await self.load_encoding()
+        
+        # Analyze all log sources concurrently; gather keeps them in source order
+        if self.llm_config.batch_size > 1:
+            log_analyses = await self._analyze_in_batches(log_collection.log_results, use_cache)
+        else:
+            log_analyses = list(await asyncio.gather(
+                *[self._analyze_or_fail(log_result, use_cache) for log_result in log_collection.log_results]
+            ))
         
         # Generate overall summary
-        summary = await self._generate_client_summary(log_collection, log_analyses)
+        summary = await self._generate_client_summary(log_collection, log_analyses, use_cache)
         
         # Determine overall status
         overall_status = self._determine_overall_status(log_analyses)
@@ -105,20 +300,100 @@ class WindowsLogAnalyzer:
             action_items=action_items
         )
     
-    async def _analyze_single_log(self, log_result: LogCollectionResult) -> LogAnalysisResult:
+    async def _analyze_or_fail(self, log_result: LogCollectionResult, use_cache: bool = True) -> LogAnalysisResult:
+        """Analyze a collected log, or report why it could not be collected."""
+        if log_result.success and log_result.content.strip():
+            return await self._analyze_single_log(log_result, use_cache)
+        
+        # Create analysis for failed log collection
+        return LogAnalysisResult(
+            source=log_result.source,
+            analysis=f"Failed to collect log: {log_result.error}",
+            issues_found=["Log collection failed"],
+            recommendations=["Check file permissions and network connectivity"],
+            severity="error",
+            confidence=1.0
+        )
+    
+    async def _analyze_in_batches(self, log_results: List[LogCollectionResult],
+                                  use_cache: bool = True) -> List[LogAnalysisResult]:
+        """Analyze collected logs batch_size at a time, keeping results in source order."""
+        analyzable = [r for r in log_results if r.success and r.content.strip()]
+        batch_size = self.llm_config.batch_size
+        batches = [analyzable[i:i + batch_size] for i in range(0, len(analyzable), batch_size)]
+        
+        batch_results = await asyncio.gather(*[self._batch_analyze(batch, use_cache) for batch in batches])
+        analyses = {}
+        for batch, results in zip(batches, batch_results):
+            for log_result, analysis in zip(batch, results):
+                analyses[id(log_result)] = analysis
+        
+        return [
+            analyses[id(log_result)] if id(log_result) in analyses else await self._analyze_or_fail(log_result, use_cache)
+            for log_result in log_results
+        ]
+    
+    async def _batch_analyze(self, log_results: List[LogCollectionResult],
+                             use_cache: bool = True) -> List[LogAnalysisResult]:
+        """Analyze several logs with one LLM request, falling back to one request per log."""
+        if len(log_results) == 1:
+            return [await self._analyze_single_log(log_results[0], use_cache)]
+        
+        sections = []
+        for number, log_result in enumerate(log_results, 1):
+            log_key = self._classify_log_source(log_result.source)
+            log_type = LOG_TYPE_INSTRUCTIONS[log_key][0]
+            sections.append(f"""LOG {number} (type={log_type}, source={log_result.source}):
+---
+{self._truncate_content(log_result.content, log_key, len(log_results))}
+---""")
+        prompt = f"Analyze the following {len(log_results)} logs.\n\n" + "\n\n".join(sections)
+        
+        try:
+            response = await self._call_llm(prompt, self._batch_system_prompt, use_cache)
+            start = response.find("[")
+            parsed = _JSON_DECODER.raw_decode(response, start)[0] if start != -1 else None
+            if (isinstance(parsed, list) and len(parsed) == len(log_results)
+                    and all(isinstance(item, dict) for item in parsed)):
+                await self._cache_response(prompt, self._batch_system_prompt, response, not use_cache)
+                return [self._result_from_parsed(item, log_result.source)
+                        for item, log_result in zip(parsed, log_results)]
+            logger.warning(f"Batch analysis returned an unusable array for {len(log_results)} logs, analyzing individually")
+        except Exception as e:
+            logger.warning(f"Batch analysis failed for {len(log_results)} logs, analyzing individually: {e}")
+        
+        return list(await asyncio.gather(*[self._analyze_single_log(r, use_cache) for r in log_results]))
+    
+    def _build_batch_system_prompt(self) -> str:
+        """Build the static instructions for multi-log requests."""
+        return f"""{self.llm_config.system_prompt}
+
+You will receive several numbered logs. Analyze each one independently.
+
+CRITICAL: You must respond ONLY with a valid JSON array containing exactly one object per log, in the same order as the logs. DO NOT include markdown code blocks, explanations, or any other text. Your response must start with [ and end with ].
+
+Required format of each array element:
+{{
+    "analysis": "Provide comprehensive technical analysis following the system prompt requirements above. Include specific error codes, file paths, registry keys, component versions, and detailed technical explanations as specified in the system prompt.",
+    "issues_found": ["List specific issues found with technical details"],
+    "recommendations": ["List specific actionable recommendations with exact commands and technical details"], 
+    "severity": "info|warning|error|critical",
+    "confidence": 0.85
+}}
+
+RESPOND WITH ONLY THE JSON ARRAY - NO OTHER TEXT"""
+    
+    async def _analyze_single_log(self, log_result: LogCollectionResult, use_cache: bool = True) -> LogAnalysisResult:
         """Analyze a single log using LLM."""
         try:
-            # Add larger delay to prevent race conditions with concurrent requests
-            await asyncio.sleep(1.0)
-            
             # Prepare prompt based on log source type
-            prompt = self._create_analysis_prompt(log_result)
+            system_prompt, prompt = self._create_analysis_prompt(log_result)
             
             # Call LLM with retry logic
             max_retries = 2
             for attempt in range(max_retries + 1):
                 try:
-                    response = await self._call_llm(prompt)
+                    response = await self._call_llm(prompt, system_prompt, use_cache)
                     break
                 except Exception as e:
                     if attempt == max_retries:
@@ -127,9 +402,13 @@ class WindowsLogAnalyzer:
                         logger.warning(f"LLM call attempt {attempt + 1} failed for {log_result.source}: {e}, retrying in 2 seconds...")
                         await asyncio.sleep(2.0)
             
-            # Parse LLM response
-            parsed_result = self._parse_llm_response(response, log_result.source)
+            # Parse LLM response; only a reply that parsed as JSON is worth caching
+            try:
+                parsed_result = self._result_from_parsed(self._decode_llm_json(response), log_result.source)
+            except Exception as e:
+                return self._fallback_result(response, log_result.source, e)
             
+            await self._cache_response(prompt, system_prompt, response, not use_cache)
             return parsed_result
             
         except Exception as e:
@@ -143,14 +422,50 @@ class WindowsLogAnalyzer:
                 confidence=0.0
             )
     
+    async def _stream_chat_completion(self, body: bytes) -> str:
+        """POST a streaming chat completion and join the content deltas as they arrive."""
+        chunks = []
+        async with self._http.stream(
+            "POST",
+            f"{self.llm_config.endpoint}/v1/chat/completions",
+            content=body,
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            logger.info(f"Response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                error_text = (await response.aread()).decode('utf-8', errors='replace')
+                logger.error(f"LLM API returned {response.status_code}: {error_text}")
+                raise Exception(f"HTTP {response.status_code}: {error_text}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data.strip() == "[DONE]":
+                    break
+                choices = orjson.loads(data).get("choices")
+                if choices:
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        chunks.append(delta)
+        
+        if not chunks:
+            logger.error("Streamed LLM response contained no content")
+            raise Exception("No response from LLM")
+        
+        response_content = "".join(chunks)
+        logger.info(f"LLM response length: {len(response_content)} characters")
+        return response_content
+    
     def _preprocess_json_string(self, json_str: str) -> str:
         """Preprocess JSON string to fix common issues."""
         try:
             # First attempt - try to load as-is
             json.loads(json_str)
             return json_str
-        except json.JSONDecodeError:
-            pass
+        except json.JSONDecodeError as e:
+            error = e
         
         # Fix common issues
         processed = json_str.strip()
@@ -162,19 +477,25 @@ class WindowsLogAnalyzer:
             close_braces = processed.count('}')
             if open_braces > close_braces:
                 processed += '}' * (open_braces - close_braces)
+                try:
+                    json.loads(processed)
+                    return processed
+                except json.JSONDecodeError as e:
+                    error = e
         
-        # Replace problematic Windows path backslashes in strings
-        import re
+        # The backslash repair is the expensive part; only run it for errors it can fix
+        if not error.msg.startswith(_BACKSLASH_ERROR_PREFIXES):
+            return json_str
         
-        # Find all string values and properly escape backslashes
+        # Replace problematic Windows path backslashes in strings
         def fix_backslashes_in_string(match):
             content = match.group(1)
             # Escape single backslashes that aren't already escaped
-            content = re.sub(r'(?<!\\)\\(?![\\"])', r'\\\\', content)
+            content = _LONE_BACKSLASH_RE.sub(r'\\\\', content)
             return f'"{content}"'
         
         # Apply to string values only (between quotes)
-        processed = re.sub(r'"([^"]*(?:\\.[^"]*)*)"', fix_backslashes_in_string, processed)
+        processed = _JSON_STRING_RE.sub(fix_backslashes_in_string, processed)
         
         # Try to parse again
         try:
@@ -184,80 +505,27 @@ class WindowsLogAnalyzer:
             # Still failing - return original for fallback handling
             return json_str
     
-    def _create_analysis_prompt(self, log_result: LogCollectionResult) -> str:
-        """Create specialized prompt based on log source type."""
-        
-        # Determine log type from source
-        source_lower = log_result.source.lower()
+    @staticmethod
+    def _classify_log_source(source: str) -> str:
+        """Map a log source to its LOG_TYPE_INSTRUCTIONS key."""
+        source_lower = source.lower()
         
         if "wuahandler" in source_lower:
-            log_type = "SCCM Windows Update Agent Handler"
-            specific_instructions = """
-            Focus on:
-            - Windows Update installation failures
-            - Update agent errors and warnings
-            - Communication issues with WSUS/Windows Update
-            - Installation progress and completion status
-            """
+            return "wuahandler"
         elif "cas.log" in source_lower:
-            log_type = "SCCM Content Access Service"
-            specific_instructions = """
-            Focus on:
-            - Content download failures
-            - Distribution point connectivity issues
-            - Content validation errors
-            - Cache management problems
-            """
+            return "cas"
         elif "cbs.log" in source_lower:
-            log_type = "Component-Based Servicing (CBS.log)"
-            specific_instructions = """
-            Focus specifically on:
-            - Package installation failures with exact package names, versions, and error codes
-            - TrustedInstaller service operations and permission errors
-            - Component store corruption with specific file paths and manifest issues
-            - SxS assembly conflicts with detailed version information
-            - System file corruption with specific .dll/.exe/.sys file names
-            - Dependency resolution problems with component hierarchies
-            - DISM operation failures and servicing stack issues
-            - WinSxS store problems and cleanup operations
-            - Registry operations and permissions errors
-            - File system operations and access denied errors
-            
-            Include specific details:
-            - Error codes (0x hex values, HRESULT codes)
-            - File paths and registry keys
-            - Package GUIDs and version numbers
-            - Timestamps and operation sequences
-            - Service names and process IDs"""
+            return "cbs"
         elif "windowsupdate" in source_lower or "get-windowsupdatelog" in source_lower:
-            log_type = "Windows Update Log"
-            specific_instructions = """
-            Focus on:
-            - Update download and installation errors
-            - Agent communication issues
-            - Reboot requirements and failures
-            - Update rollback scenarios
-            """
+            return "windowsupdate"
         elif "powershell" in source_lower and "winevent" in source_lower:
-            log_type = "Windows Event Log"
-            specific_instructions = """
-            Focus on:
-            - Critical system events
-            - Application and service failures
-            - Security-related events
-            - Hardware and driver issues
-            """
+            return "eventlog"
         else:
-            log_type = "Windows System Log"
-            specific_instructions = """
-            Focus on:
-            - Error and warning messages
-            - System component failures
-            - Configuration issues
-            - Performance problems
-            """
-        
-        prompt = f"""{self.llm_config.system_prompt}
+            return "system"
+    
+    def _build_system_prompt(self, log_type: str, specific_instructions: str) -> str:
+        """Build the static instructions for one log type."""
+        return f"""{self.llm_config.system_prompt}
 
 LOG TYPE: {log_type}
 
@@ -281,62 +549,101 @@ ANALYSIS INSTRUCTIONS:
 4. For all logs: Provide the detailed technical analysis format required by the system prompt
 5. Include confidence level (0.0 to 1.0)
 
-RESPOND WITH ONLY THE JSON OBJECT - NO OTHER TEXT:
-
-LOG CONTENT TO ANALYZE:
+RESPOND WITH ONLY THE JSON OBJECT - NO OTHER TEXT"""
+    
+    def _create_analysis_prompt(self, log_result: LogCollectionResult) -> Tuple[str, str]:
+        """Return the (system, user) prompt pair for a log: static instructions and the log content."""
+        log_key = self._classify_log_source(log_result.source)
+        system_prompt = self._system_prompts[log_key]
+        user_prompt = f"""LOG CONTENT TO ANALYZE:
 ---
-{log_result.content[:8000]}
+{self._truncate_content(log_result.content, log_key)}
 ---"""
+        return system_prompt, user_prompt
+    
+    async def _call_llm(self, prompt: str, system_prompt: Optional[str] = None, use_cache: bool = True) -> str:
+        """Call the LLM endpoint, bounded by the configured concurrency and rate limit.
+        
+        A cached response is returned when use_cache is set. Fresh responses are not cached
+        here; callers store them with _cache_response once they have parsed.
+        """
+        if use_cache and self._response_cache is not None:
+            # diskcache is backed by SQLite, so its reads and writes run off the event loop
+            cached = await asyncio.to_thread(self._response_cache.get, self._cache_key(prompt, system_prompt))
+            if cached is not None:
+                logger.info(f"LLM response cache hit ({len(cached)} characters)")
+                return cached
+        
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.llm_config.concurrency or 4)
+        async with self._llm_semaphore:
+            await self._wait_for_rate_limit()
+            return await self._post_chat_completion(prompt, system_prompt)
+    
+    async def _cache_response(self, prompt: str, system_prompt: Optional[str], response: str,
+                              replace: bool = False):
+        """Cache a response that parsed successfully.
         
-        return prompt
+        Without replace an existing entry is kept, so a response that came from the cache
+        is not written back; a forced refresh passes replace=True to overwrite it.
+        """
+        if self._response_cache is None:
+            return
+        store = self._response_cache.set if replace else self._response_cache.add
+        await asyncio.to_thread(store, self._cache_key(prompt, system_prompt), response,
+                                expire=self.settings.llm_cache_ttl)
     
-    async def _call_llm(self, prompt: str) -> str:
-        """Call the LLM endpoint with the given prompt."""
+    async def _post_chat_completion(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Send one chat completion request and return the message content."""
         try:
             # Add detailed logging
             logger.info(f"Making LLM request to {self.llm_config.endpoint}/v1/chat/completions")
             logger.info(f"Model: {self.llm_config.model}")
             logger.info(f"Prompt length: {len(prompt)} characters")
             
-            async with httpx.AsyncClient(timeout=120.0) as client:  # Increased timeout
-                payload = {
-                    "model": self.llm_config.model,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": self.llm_config.max_tokens,
-                    "temperature": self.llm_config.temperature,
-                    "stream": False
-                }
-                
-                logger.info(f"Payload size: {len(str(payload))} characters")
-                
-                response = await client.post(
-                    f"{self.llm_config.endpoint}/v1/chat/completions",
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Connection": "close"  # Force close connection after each request
-                    }
-                )
-                
-                logger.info(f"Response status: {response.status_code}")
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"LLM API returned {response.status_code}: {error_text}")
-                    raise Exception(f"HTTP {response.status_code}: {error_text}")
-                
-                result = response.json()
+            # The static system message comes first so its prefix can be reused across calls
+            messages = []
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
+            messages.append({"role": "user", "content": prompt})
+            
+            payload = {
+                "model": self.llm_config.model,
+                "messages": messages,
+                "max_tokens": self.llm_config.max_tokens,
+                "temperature": self.llm_config.temperature,
+                "stream": self.llm_config.stream
+            }
+            
+            body = orjson.dumps(payload)
+            logger.info(f"Payload size: {len(body)} bytes")
+            
+            if self.llm_config.stream:
+                return await self._stream_chat_completion(body)
+            
+            response = await self._http.post(
+                f"{self.llm_config.endpoint}/v1/chat/completions",
+                content=body,
+                headers={"Content-Type": "application/json"}
+            )
+            
+            logger.info(f"Response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"LLM API returned {response.status_code}: {error_text}")
+                raise Exception(f"HTTP {response.status_code}: {error_text}")
+            
+            result = orjson.loads(response.content)
+            
+            if "choices" in result and len(result["choices"]) > 0:
+                response_content = result["choices"][0]["message"]["content"]
+                logger.info(f"LLM response length: {len(response_content)} characters")
+                return response_content
+            else:
+                logger.error(f"Invalid LLM response structure: {result}")
+                raise Exception("No response from LLM")
                 
-                if "choices" in result and len(result["choices"]) > 0:
-                    response_content = result["choices"][0]["message"]["content"]
-                    logger.info(f"LLM response length: {len(response_content)} characters")
-                    return response_content
-                else:
-                    logger.error(f"Invalid LLM response structure: {result}")
-                    raise Exception("No response from LLM")
-                    
         except httpx.TimeoutException:
             logger.error("LLM request timed out")
             raise Exception("LLM request timed out")
@@ -347,74 +654,82 @@ LOG CONTENT TO ANALYZE:
             logger.error(f"Error calling LLM: {e}")
             raise Exception(f"Error calling LLM: {e}")
     
+    @staticmethod
+    def _result_from_parsed(parsed: Dict[str, Any], source: str) -> LogAnalysisResult:
+        """Build a LogAnalysisResult from one decoded analysis object."""
+        return LogAnalysisResult(
+            source=source,
+            analysis=parsed.get("analysis", "No analysis provided"),
+            issues_found=parsed.get("issues_found", []),
+            recommendations=parsed.get("recommendations", []),
+            severity=parsed.get("severity", "info"),
+            confidence=float(parsed.get("confidence", 0.5))
+        )
+    
     def _parse_llm_response(self, response: str, source: str) -> LogAnalysisResult:
         """Parse the LLM response into structured result."""
         try:
-            # Clean and extract JSON from response
-            response = response.strip()
-            
-            # Try multiple approaches to extract JSON
-            json_str = None
-            
-            # Method 1: Look for markdown code blocks
-            if "```json" in response:
-                start = response.find("```json") + 7
-                end = response.find("```", start)
-                json_str = response[start:end].strip()
-            elif "```" in response and "{" in response:
-                start = response.find("```") + 3
-                end = response.find("```", start)
-                json_str = response[start:end].strip()
-            
-            # Method 2: Extract JSON object boundaries
-            if not json_str:
-                start = response.find("{")
-                if start != -1:
-                    # Find the matching closing brace
-                    brace_count = 0
-                    end = start
-                    for i, char in enumerate(response[start:], start):
-                        if char == "{":
-                            brace_count += 1
-                        elif char == "}":
-                            brace_count -= 1
-                            if brace_count == 0:
-                                end = i + 1
-                                break
-                    if brace_count == 0:
-                        json_str = response[start:end]
-            
-            # Method 3: If no JSON structure found, try the whole response
-            if not json_str and response.startswith("{") and response.endswith("}"):
-                json_str = response
-            
-            # Method 4: Handle truncated JSON - if starts with { but no closing brace found
-            if not json_str and response.startswith("{"):
-                json_str = response
-            
-            if json_str:
-                # Preprocess JSON string to fix common issues
-                json_str = self._preprocess_json_string(json_str)
-                
-                # Parse JSON
-                parsed = json.loads(json_str)
-                
-                return LogAnalysisResult(
-                    source=source,
-                    analysis=parsed.get("analysis", "No analysis provided"),
-                    issues_found=parsed.get("issues_found", []),
-                    recommendations=parsed.get("recommendations", []),
-                    severity=parsed.get("severity", "info"),
-                    confidence=float(parsed.get("confidence", 0.5))
-                )
-            else:
-                # No JSON found - log the raw response and treat as raw text
-                logger.warning(f"No JSON structure found in LLM response")
-                logger.warning(f"Raw LLM response: {repr(response)}")
-                raise ValueError("No JSON structure found in response")
+            return self._result_from_parsed(self._decode_llm_json(response), source)
+        except Exception as e:
+            return self._fallback_result(response, source, e)
+    
+    def _decode_llm_json(self, response: str) -> Any:
+        """Extract and decode the JSON object in an LLM response, raising if there is none."""
+        # Clean and extract JSON from response
+        response = response.strip()
+        
+        # Try multiple approaches to extract JSON
+        json_str = None
+        
+        # Method 1: Look for markdown code blocks
+        if "```json" in response:
+            start = response.find("```json") + 7
+            end = response.find("```", start)
+            json_str = response[start:end].strip()
+        elif "```" in response and "{" in response:
+            start = response.find("```") + 3
+            end = response.find("```", start)
+            json_str = response[start:end].strip()
+        
+        # Method 2: Decode the first JSON object in C; quoted braces don't confuse it
+        if not json_str:
+            start = response.find("{")
+            if start != -1:
+                try:
+                    _, end = _JSON_DECODER.raw_decode(response, start)
+                    json_str = response[start:end]
+                except json.JSONDecodeError:
+                    json_str = None
+        
+        # Method 3: If no JSON structure found, try the whole response
+        if not json_str and response.startswith("{") and response.endswith("}"):
+            json_str = response
+        
+        # Method 4: Handle truncated JSON - if starts with { but no closing brace found
+        if not json_str and response.startswith("{"):
+            json_str = response
+        
+        if json_str:
+            # Parse JSON, repairing common issues only if the fast parse fails
+            try:
+                parsed = orjson.loads(json_str)
+            except orjson.JSONDecodeError:
+                # The repair validates with the stdlib parser, which also accepts input
+                # orjson rejects (NaN, lone surrogates), so parse its output the same way
+                parsed = json.loads(self._preprocess_json_string(json_str))
             
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse LLM JSON response: {e}")
+            return parsed
+        else:
+            # No JSON found - log the raw response and treat as raw text
+            logger.warning(f"No JSON structure found in LLM response")
+            logger.warning(f"Raw LLM response: {repr(response)}")
+            raise ValueError("No JSON structure found in response")
+    
+    def _fallback_result(self, response: str, source: str, error: Exception) -> LogAnalysisResult:
+        """Build a result for a response that could not be parsed as JSON."""
+        response = response.strip()
+        if isinstance(error, json.JSONDecodeError):
+            logger.warning(f"Failed to parse LLM JSON response: {error}")
             logger.warning(f"Raw LLM response: {repr(response)}")
             
             # Enhanced fallback: extract key information from text
@@ -450,19 +765,19 @@ LOG CONTENT TO ANALYZE:
                 severity=severity,
                 confidence=confidence
             )
-        except Exception as e:
-            logger.error(f"Error parsing LLM response: {e}")
-            return LogAnalysisResult(
-                source=source,
-                analysis=f"Failed to parse response: {str(e)}",
-                issues_found=[f"Parse error: {str(e)}"],
-                recommendations=["Check LLM response format"],
-                severity="error",
-                confidence=0.0
-            )
+        
+        logger.error(f"Error parsing LLM response: {error}")
+        return LogAnalysisResult(
+            source=source,
+            analysis=f"Failed to parse response: {str(error)}",
+            issues_found=[f"Parse error: {str(error)}"],
+            recommendations=["Check LLM response format"],
+            severity="error",
+            confidence=0.0
+        )
     
     async def _generate_client_summary(self, log_collection: ClientLogCollection, 
-                                     log_analyses: List[LogAnalysisResult]) -> str:
+                                     log_analyses: List[LogAnalysisResult], use_cache: bool = True) -> str:
         """Generate overall summary for the client."""
         
         # Prepare summary data
@@ -496,8 +811,10 @@ KEY FINDINGS:
         summary_prompt += "\n\nProvide a 2-3 sentence executive summary highlighting the most critical issues and overall system health."
         
         try:
-            summary = await self._call_llm(summary_prompt)
-            return summary.strip()
+            summary = (await self._call_llm(summary_prompt, use_cache=use_cache)).strip()
+            if summary:
+                await self._cache_response(summary_prompt, None, summary, not use_cache)
+            return summary
         except Exception as e:
             logger.error(f"Failed to generate summary: {e}")
             return f"Analysis completed for {successful_logs}/{total_logs} logs. Found {critical_issues} critical issues, {error_issues} errors, {warning_issues} warnings."
@@ -544,11 +861,12 @@ KEY FINDINGS:
         
         return unique_items[:10]  # Limit to top 10 action items
     
-    async def analyze_multiple_clients(self, log_collections: List[ClientLogCollection]) -> List[ClientAnalysisResult]:
+    async def analyze_multiple_clients(self, log_collections: List[ClientLogCollection],
+                                       use_cache: bool = True) -> List[ClientAnalysisResult]:
         """Analyze logs from multiple clients concurrently."""
         logger.info(f"Starting concurrent LLM analysis for {len(log_collections)} clients")
         
-        tasks = [self.analyze_client_logs(collection) for collection in log_collections]
+        tasks = [self.analyze_client_logs(collection, use_cache) for collection in log_collections]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Handle exceptions
@@ -0,0 +1,207 @@
+"""
+Local log file access shared by the SMB MCP servers: share path mapping, tail reads,
+directory listings and a short-lived cache of check_file_exists results.
+"""
+
+import functools
+import logging
+import mmap
+import os
+import stat as os_stat
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Block size used when scanning a file backwards for its last lines
+TAIL_BLOCK = 64 * 1024
+
+
+def tail_offset(f, lines: int) -> int:
+    """Scan blocks backwards from EOF and return the byte offset where the last N lines start."""
+    end = f.seek(0, os.SEEK_END)
+    if lines <= 0:
+        return end
+    
+    pos = end
+    remaining = lines
+    while pos > 0:
+        start = max(0, pos - TAIL_BLOCK)
+        f.seek(start)
+        block = f.read(pos - start)
+        
+        # A trailing newline ends the last line rather than starting another one
+        idx = len(block) - 1 if pos == end and block.endswith(b"\n") else len(block)
+        while True:
+            idx = block.rfind(b"\n", 0, idx)
+            if idx < 0:
+                break
+            remaining -= 1
+            if remaining == 0:
+                return start + idx + 1
+        pos = start
+    
+    return 0
+
+
+# Files larger than this are tailed through mmap instead of block reads
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+
+def mmap_tail(f, lines: int) -> bytes:
+    """Find the last N lines with rfind over a read-only mapping and copy them out once."""
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = mm.size()
+        if lines <= 0:
+            return b""
+        pos = end - 1 if mm[end - 1:end] == b"\n" else end
+        for _ in range(lines):
+            pos = mm.rfind(b"\n", 0, pos)
+            if pos < 0:
+                return mm[:]
+        return mm[pos + 1:]
+
+
+def read_tail(f, lines: int) -> bytes:
+    """Read the bytes of the last N lines of an open binary file."""
+    if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+        try:
+            return mmap_tail(f, lines)
+        except (OSError, ValueError) as e:
+            logger.debug(f"mmap unavailable, falling back to block reads: {e}")
+    
+    f.seek(tail_offset(f, lines))
+    return f.read()
+
+
+# O_SEQUENTIAL maps to FILE_FLAG_SEQUENTIAL_SCAN in the Windows C runtime; elsewhere these are 0
+_LOG_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_BINARY", 0) | getattr(os, "O_SEQUENTIAL", 0)
+
+
+def open_log(local_path: str):
+    """Open a log file for binary reads, hinting sequential access to the Windows cache manager."""
+    return os.fdopen(os.open(local_path, _LOG_OPEN_FLAGS), 'rb')
+
+
+def drop_cached_pages(f):
+    """Ask the kernel to evict a file's pages once it has been read, where supported."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError as e:
+            logger.debug(f"posix_fadvise failed: {e}")
+
+
+def count_lines(f) -> int:
+    """Count lines by streaming the file forward in blocks."""
+    f.seek(0)
+    total = 0
+    last = b""
+    for block in iter(lambda: f.read(TAIL_BLOCK), b""):
+        total += block.count(b"\n")
+        last = block
+    if last and not last.endswith(b"\n"):
+        total += 1
+    return total
+
+
+# Hosts served from the local filesystem in test mode
+LOCAL_HOSTS = frozenset({'localhost', '127.0.0.1'})
+
+_SLASH_TRANS = str.maketrans('/', '\\')
+
+
+@functools.lru_cache(maxsize=1024)
+def to_local(path: str) -> str:
+    """Convert a share path such as 'C$/Windows/Logs' to a local 'C:\\Windows\\Logs' path."""
+    if path.startswith("C$/"):
+        path = path[3:]
+    return "C:\\" + path.translate(_SLASH_TRANS)
+
+
+# check_file_exists results are reused for this many seconds
+STAT_CACHE_TTL = 2.0
+STAT_CACHE_MAX_ENTRIES = 1024
+
+_stat_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_stat_cache_lock = threading.Lock()
+
+
+def get_cached_stat(local_path: str) -> Optional[Dict[str, Any]]:
+    """Return a recent check_file_exists result for a path, if one is still fresh."""
+    with _stat_cache_lock:
+        entry = _stat_cache.get(local_path)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at >= STAT_CACHE_TTL:
+            _stat_cache.pop(local_path, None)
+            return None
+        _stat_cache.move_to_end(local_path)
+        return result
+
+
+def store_cached_stat(local_path: str, result: Dict[str, Any]):
+    """Remember a check_file_exists result, evicting the oldest entries past the size bound."""
+    with _stat_cache_lock:
+        _stat_cache[local_path] = (time.monotonic(), result)
+        _stat_cache.move_to_end(local_path)
+        while len(_stat_cache) > STAT_CACHE_MAX_ENTRIES:
+            _stat_cache.popitem(last=False)
+
+
+def invalidate_cached_stat(local_path: str):
+    """Forget any cached check_file_exists result for a path."""
+    with _stat_cache_lock:
+        _stat_cache.pop(local_path, None)
+
+
+# File-type bits of st_mode, compared inline instead of calling stat.S_ISDIR per entry
+_S_IFMT = 0o170000
+_S_IFDIR = os_stat.S_IFDIR
+
+# Directories with at least this many entries have their stats fanned out to stat_pool
+STAT_POOL_THRESHOLD = 32
+
+# Shared across calls so repeated listings reuse the same threads
+stat_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="smb-stat")
+
+
+def entry_info(entry: os.DirEntry) -> Tuple[str, int, float, bool]:
+    """Describe a directory entry as (name, size, mtime, is_dir), zeroed if it cannot be stat'ed."""
+    try:
+        st = entry.stat()
+        return entry.name, st.st_size, st.st_mtime, (st.st_mode & _S_IFMT) == _S_IFDIR
+    except Exception as e:
+        logger.warning(f"Failed to stat {entry.name}: {e}")
+        return entry.name, 0, 0, False
+
+
+def directory_columns(infos: List[Tuple[str, int, float, bool]]) -> Dict[str, List[Any]]:
+    """Lay directory entries out column-wise so each field name is written once per listing."""
+    names, sizes, mtimes, is_dir = (list(column) for column in zip(*infos)) if infos else ([], [], [], [])
+    return {
+        "names": names,
+        "sizes": sizes,
+        "mtimes": mtimes,
+        "is_dir": is_dir
+    }
+
+
+def scan_directory(local_path: str) -> Dict[str, List[Any]]:
+    """List a local directory as columns of names, sizes, mtimes and is_dir flags.
+    
+    Raises FileNotFoundError if the directory does not exist.
+    """
+    with os.scandir(local_path) as it:
+        entries = list(it)
+    
+    if len(entries) < STAT_POOL_THRESHOLD:
+        infos = [entry_info(entry) for entry in entries]
+    else:
+        infos = list(stat_pool.map(entry_info, entries))
+    return directory_columns(infos)
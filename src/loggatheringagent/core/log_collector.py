@@ -93,29 +93,27 @@ class WindowsLogCollector:
         if is_localhost:
             # Use DirectLocalClient for localhost
             async with DirectLocalClient() as local_client:
-                # Collect file-based logs
-                smb_results = await self._collect_file_logs(client_config, cred_config, local_client)
+                # Collect file-based and PowerShell-based logs concurrently
+                smb_results, ps_results = await asyncio.gather(
+                    self._collect_file_logs(client_config, cred_config, local_client),
+                    self._collect_powershell_logs(client_config, cred_config, local_client)
+                )
                 log_results.extend(smb_results["results"])
                 errors.extend(smb_results["errors"])
-                
-                # Collect PowerShell-based logs
-                ps_results = await self._collect_powershell_logs(client_config, cred_config, local_client)
                 log_results.extend(ps_results["results"])
                 errors.extend(ps_results["errors"])
         else:
             # Use MCP clients for remote machines
             try:
-                # Collect file-based logs using SMB MCP client
-                async with SMBMCPClient() as smb_client:
-                    smb_results = await self._collect_file_logs_mcp(client_config, cred_config, smb_client)
-                    log_results.extend(smb_results["results"])
-                    errors.extend(smb_results["errors"])
-                
-                # Collect PowerShell-based logs using PowerShell MCP client
-                async with PowerShellMCPClient() as ps_client:
-                    ps_results = await self._collect_powershell_logs_mcp(client_config, cred_config, ps_client)
-                    log_results.extend(ps_results["results"])
-                    errors.extend(ps_results["errors"])
+                # Collect file-based logs via SMB and PowerShell-based logs via WinRM concurrently
+                smb_results, ps_results = await asyncio.gather(
+                    self._collect_remote_file_logs(client_config, cred_config),
+                    self._collect_remote_powershell_logs(client_config, cred_config)
+                )
+                log_results.extend(smb_results["results"])
+                errors.extend(smb_results["errors"])
+                log_results.extend(ps_results["results"])
+                errors.extend(ps_results["errors"])
             except Exception as e:
                 logger.error(f"MCP client error for {client_config.hostname}: {e}")
                 errors.append(f"MCP client connection failed: {e}")
@@ -130,6 +128,18 @@ class WindowsLogCollector:
             errors=errors
         )
     
+    async def _collect_remote_file_logs(self, client_config: ClientConfig,
+                                      cred_config: CredentialConfig) -> Dict[str, Any]:
+        """Collect file-based logs from a remote machine through its own SMB MCP client."""
+        async with SMBMCPClient() as smb_client:
+            return await self._collect_file_logs_mcp(client_config, cred_config, smb_client)
+    
+    async def _collect_remote_powershell_logs(self, client_config: ClientConfig,
+                                            cred_config: CredentialConfig) -> Dict[str, Any]:
+        """Collect PowerShell-based logs from a remote machine through its own PowerShell MCP client."""
+        async with PowerShellMCPClient() as ps_client:
+            return await self._collect_powershell_logs_mcp(client_config, cred_config, ps_client)
+    
     async def _collect_file_logs(self, client_config: ClientConfig, 
                               cred_config: CredentialConfig, local_client: DirectLocalClient) -> Dict[str, Any]:
         """Collect file-based logs using direct local client."""
@@ -142,11 +152,12 @@ class WindowsLogCollector:
             for category, paths in client_config.log_paths.items():
                 all_log_paths.extend(paths)
             
-            for log_path in all_log_paths:
-                try:
+            semaphore = asyncio.Semaphore(self.settings.max_concurrent_collections)
+            
+            async def read_tail(log_path: str) -> Dict[str, Any]:
+                async with semaphore:
                     logger.info(f"Reading log file: {log_path}")
-                    
-                    result = await local_client.read_file_tail(
+                    return await local_client.read_file_tail(
                         hostname=client_config.hostname,
                         username=cred_config.username,
                         password=cred_config.password,
@@ -154,6 +165,17 @@ class WindowsLogCollector:
                         lines=self.settings.log_tail_lines,
                         domain=cred_config.domain
                     )
+            
+            # Read all files concurrently, bounded by the semaphore
+            read_results = await asyncio.gather(
+                *[read_tail(log_path) for log_path in all_log_paths],
+                return_exceptions=True
+            )
+            
+            for log_path, result in zip(all_log_paths, read_results):
+                try:
+                    if isinstance(result, Exception):
+                        raise result
                     
                     if result["success"]:
                         log_result = LogCollectionResult(
@@ -199,85 +221,77 @@ class WindowsLogCollector:
         errors = []
         
         try:
-            for command in client_config.powershell_commands:
-                try:
-                    logger.info(f"Executing PowerShell command: {command}")
-                    
-                    if "Get-WindowsUpdateLog" in command:
-                        # Special handling for Windows Update Log
-                        result = await local_client.get_windows_update_log(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password
-                        )
-                    elif "Get-WinEvent" in command:
-                        # Extract parameters for Event Log query
-                        if "System" in command:
-                            log_name = "System"
-                        elif "Application" in command:
-                            log_name = "Application"
-                        else:
-                            log_name = "System"
-                        
-                        # Extract event IDs if specified
-                        event_ids = []
-                        if "@(" in command and ")" in command:
-                            ids_part = command.split("@(")[1].split(")")[0]
-                            event_ids = [int(x.strip()) for x in ids_part.split(",")]
-                        
-                        # Extract source filter
-                        source_filter = None
-                        if "Source -like" in command:
-                            source_part = command.split("Source -like")[1].strip()
-                            source_filter = source_part.strip("'\"").replace("*", "*")
-                        
-                        result = await local_client.get_event_log(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password,
-                            log_name=log_name,
-                            max_events=100,
-                            event_ids=event_ids if event_ids else None,
-                            source_filter=source_filter
-                        )
-                    else:
-                        # Generic PowerShell command execution
-                        result = await local_client.execute_powershell(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password,
-                            command=command
-                        )
-                    
-                    if result["success"]:
-                        log_result = LogCollectionResult(
-                            source=f"PowerShell:{command[:50]}...",
-                            success=True,
-                            content=result["stdout"],
-                            lines_count=result["stdout"].count("\n") if result["stdout"] else 0
-                        )
+            # Build one batch item per configured command
+            commands = client_config.powershell_commands
+            items = []
+            for command in commands:
+                logger.info(f"Executing PowerShell command: {command}")
+                
+                if "Get-WindowsUpdateLog" in command:
+                    # Special handling for Windows Update Log
+                    items.append({"tool": "get_windows_update_log", "arguments": {}})
+                elif "Get-WinEvent" in command:
+                    # Extract parameters for Event Log query
+                    if "System" in command:
+                        log_name = "System"
+                    elif "Application" in command:
+                        log_name = "Application"
                     else:
-                        log_result = LogCollectionResult(
-                            source=f"PowerShell:{command[:50]}...",
-                            success=False,
-                            content=result.get("stdout", ""),
-                            error=result.get("stderr", "Unknown PowerShell error")
-                        )
-                        errors.append(f"PowerShell error for '{command}': {result.get('stderr', 'Unknown error')}")
+                        log_name = "System"
                     
-                    results.append(log_result)
+                    # Extract event IDs if specified
+                    event_ids = []
+                    if "@(" in command and ")" in command:
+                        ids_part = command.split("@(")[1].split(")")[0]
+                        event_ids = [int(x.strip()) for x in ids_part.split(",")]
                     
-                except Exception as e:
-                    error_msg = f"Exception executing '{command}': {str(e)}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
+                    # Extract source filter
+                    source_filter = None
+                    if "Source -like" in command:
+                        source_part = command.split("Source -like")[1].strip()
+                        source_filter = source_part.strip("'\"").replace("*", "*")
                     
-                    results.append(LogCollectionResult(
+                    items.append({
+                        "tool": "get_event_log",
+                        "arguments": {
+                            "log_name": log_name,
+                            "max_events": 100,
+                            "event_ids": event_ids if event_ids else None,
+                            "source_filter": source_filter
+                        }
+                    })
+                else:
+                    # Generic PowerShell command execution
+                    items.append({"tool": "execute_powershell", "arguments": {"command": command}})
+            
+            # Run all commands in a single PowerShell invocation
+            batch_results = []
+            if items:
+                batch_results = await local_client.batch_execute(
+                    hostname=client_config.hostname,
+                    username=cred_config.username,
+                    password=cred_config.password,
+                    items=items
+                )
+            
+            for command, result in zip(commands, batch_results):
+                if result["success"]:
+                    log_result = LogCollectionResult(
+                        source=f"PowerShell:{command[:50]}...",
+                        success=True,
+                        content=result["stdout"],
+                        lines_count=result["stdout"].count("\n") if result["stdout"] else 0
+                    )
+                else:
+                    log_result = LogCollectionResult(
                         source=f"PowerShell:{command[:50]}...",
                         success=False,
-                        content="",
-                        error=str(e)
-                    ))
+                        content=result.get("stdout", ""),
+                        error=result.get("stderr", "Unknown PowerShell error")
+                    )
+                    errors.append(f"PowerShell error for '{command}': {result.get('stderr', 'Unknown error')}")
+                
+                results.append(log_result)
         
         except Exception as e:
             error_msg = f"PowerShell command execution failed: {str(e)}"
@@ -290,7 +304,14 @@ class WindowsLogCollector:
         """Collect logs from multiple clients concurrently."""
         logger.info(f"Starting concurrent log collection for {len(client_names)} clients")
         
-        tasks = [self.collect_client_logs(client_name) for client_name in client_names]
+        # Created per call so it binds to the running event loop
+        semaphore = asyncio.Semaphore(self.settings.max_concurrent_collections)
+        
+        async def collect_bounded(client_name: str) -> ClientLogCollection:
+            async with semaphore:
+                return await self.collect_client_logs(client_name)
+        
+        tasks = [collect_bounded(client_name) for client_name in client_names]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Handle any exceptions that occurred
@@ -322,11 +343,12 @@ class WindowsLogCollector:
             for category, paths in client_config.log_paths.items():
                 all_log_paths.extend(paths)
             
-            for log_path in all_log_paths:
-                try:
+            semaphore = asyncio.Semaphore(self.settings.max_concurrent_collections)
+            
+            async def read_tail(log_path: str) -> Dict[str, Any]:
+                async with semaphore:
                     logger.info(f"Reading remote log file: {log_path}")
-                    
-                    result = await smb_client.read_file_tail(
+                    return await smb_client.read_file_tail(
                         hostname=client_config.hostname,
                         username=cred_config.username,
                         password=cred_config.password,
@@ -334,6 +356,17 @@ class WindowsLogCollector:
                         lines=self.settings.log_tail_lines,
                         domain=cred_config.domain
                     )
+            
+            # Read all files concurrently over the one MCP session, bounded by the semaphore
+            read_results = await asyncio.gather(
+                *[read_tail(log_path) for log_path in all_log_paths],
+                return_exceptions=True
+            )
+            
+            for log_path, result in zip(all_log_paths, read_results):
+                try:
+                    if isinstance(result, Exception):
+                        raise result
                     
                     success = result.get("success", False)
                     content = result.get("content", "")
@@ -371,70 +404,61 @@ class WindowsLogCollector:
         errors = []
         
         try:
-            for command in client_config.powershell_commands:
-                try:
-                    logger.info(f"Executing remote PowerShell command: {command}")
-                    
-                    if "Get-WindowsUpdateLog" in command:
-                        # Special handling for Windows Update Log
-                        result = await ps_client.get_windows_update_log(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password
-                        )
-                    elif "Get-WinEvent" in command:
-                        # Extract parameters for Event Log query
-                        if "System" in command:
-                            log_name = "System"
-                        elif "Application" in command:
-                            log_name = "Application"
-                        else:
-                            log_name = "System"
-                        
-                        # Extract max events
-                        max_events = 100
-                        if "MaxEvents" in command:
-                            try:
-                                max_events = int(command.split("MaxEvents")[1].split()[0])
-                            except:
-                                max_events = 100
-                        
-                        result = await ps_client.get_event_log(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password,
-                            log_name=log_name,
-                            max_events=max_events
-                        )
+            # Build one batch item per configured command
+            commands = client_config.powershell_commands
+            items = []
+            for command in commands:
+                logger.info(f"Executing remote PowerShell command: {command}")
+                
+                if "Get-WindowsUpdateLog" in command:
+                    # Special handling for Windows Update Log
+                    items.append({"tool": "get_windows_update_log", "arguments": {}})
+                elif "Get-WinEvent" in command:
+                    # Extract parameters for Event Log query
+                    if "System" in command:
+                        log_name = "System"
+                    elif "Application" in command:
+                        log_name = "Application"
                     else:
-                        # Generic PowerShell command execution
-                        result = await ps_client.execute_powershell(
-                            hostname=client_config.hostname,
-                            username=cred_config.username,
-                            password=cred_config.password,
-                            command=command
-                        )
+                        log_name = "System"
                     
-                    success = result.get("success", False)
-                    content = result.get("stdout", "") or result.get("content", "")
-                    
-                    results.append(LogCollectionResult(
-                        source=f"PowerShell:{command[:50]}...",
-                        success=success,
-                        content=content,
-                        error=result.get("stderr") or result.get("error") if not success else None,
-                        lines_count=len(content.split('\n')) if content else 0
-                    ))
+                    # Extract max events
+                    max_events = 100
+                    if "MaxEvents" in command:
+                        try:
+                            max_events = int(command.split("MaxEvents")[1].split()[0])
+                        except:
+                            max_events = 100
                     
-                except Exception as e:
-                    error_msg = f"PowerShell command '{command}' failed: {str(e)}"
-                    logger.error(error_msg)
-                    results.append(LogCollectionResult(
-                        source=f"PowerShell:{command[:50]}...",
-                        success=False,
-                        content="",
-                        error=error_msg
-                    ))
+                    items.append({
+                        "tool": "get_event_log",
+                        "arguments": {"log_name": log_name, "max_events": max_events}
+                    })
+                else:
+                    # Generic PowerShell command execution
+                    items.append({"tool": "execute_powershell", "arguments": {"command": command}})
+            
+            # Run all commands in a single WinRM round trip
+            batch_results = []
+            if items:
+                batch_results = await ps_client.batch_execute(
+                    hostname=client_config.hostname,
+                    username=cred_config.username,
+                    password=cred_config.password,
+                    items=items
+                )
+            
+            for command, result in zip(commands, batch_results):
+                success = result.get("success", False)
+                content = result.get("stdout", "") or result.get("content", "")
+                
+                results.append(LogCollectionResult(
+                    source=f"PowerShell:{command[:50]}...",
+                    success=success,
+                    content=content,
+                    error=result.get("stderr") or result.get("error") if not success else None,
+                    lines_count=len(content.split('\n')) if content else 0
+                ))
         
         except Exception as e:
             error_msg = f"PowerShell MCP client error: {str(e)}"
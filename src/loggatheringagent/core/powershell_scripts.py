@@ -0,0 +1,178 @@
+"""
+PowerShell tool scripts and the helpers that bind arguments to them, shared by the
+PowerShell MCP servers and the direct local client.
+"""
+
+import base64
+import functools
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Static tool scripts - user input is bound to parameters, never spliced into the source
+WINUPDATE_SCRIPT = r"""
+param([string]$OutputPath)
+
+# Create the output directory if it doesn't exist
+New-Item -ItemType Directory -Path (Split-Path -Parent $OutputPath) -Force | Out-Null
+
+# Generate Windows Update log
+Get-WindowsUpdateLog -LogPath $OutputPath
+
+# Read and return the last 1000 lines from a single 256KB read at the end of the file
+if (Test-Path -LiteralPath $OutputPath) {
+    $fs = [System.IO.File]::Open($OutputPath, 'Open', 'Read', 'ReadWrite')
+    try {
+        $length = $fs.Length
+        $bom = New-Object byte[] 2
+        [void]$fs.Read($bom, 0, 2)
+        $encoding = if ($bom[0] -eq 0xFF -and $bom[1] -eq 0xFE) { [Text.Encoding]::Unicode } else { [Text.Encoding]::UTF8 }
+        $take = [Math]::Min(262144, $length)
+        if ($encoding -eq [Text.Encoding]::Unicode) { $take -= $take % 2 }
+        [void]$fs.Seek(-$take, 'End')
+        $buffer = New-Object byte[] $take
+        $read = 0
+        while ($read -lt $take) {
+            $count = $fs.Read($buffer, $read, $take - $read)
+            if ($count -le 0) { break }
+            $read += $count
+        }
+    } finally {
+        $fs.Close()
+    }
+    
+    $lines = $encoding.GetString($buffer, 0, $read).TrimStart([char]0xFEFF) -split "`r?`n"
+    # The first line is cut in half unless the whole file was read
+    $first = if ($take -lt $length) { 1 } else { 0 }
+    $last = $lines.Count - 1
+    if ($last -ge 0 -and $lines[$last] -eq '') { $last-- }
+    $lines = if ($last -ge $first) { $lines[$first..$last] } else { @() }
+    ($lines | Select-Object -Last 1000) -join "`n"
+} else {
+    "Failed to generate Windows Update log"
+}
+"""
+
+EVENTLOG_SCRIPT = r"""
+param([string]$LogName, [int]$MaxEvents, [int[]]$EventIds, [string]$SourceFilter)
+
+# Push the filters into the event log query so the service does the filtering
+$filter = @{ LogName = $LogName }
+if ($EventIds) { $filter['Id'] = $EventIds }
+if ($SourceFilter) { $filter['ProviderName'] = $SourceFilter }
+
+# An empty match is not an error when filtering; Ignore also keeps it out of $Error
+$errorAction = if ($EventIds -or $SourceFilter) { 'Ignore' } else { 'Continue' }
+
+# Emit one compact JSON object per event (NDJSON) instead of buffering a single array
+Get-WinEvent -FilterHashtable $filter -MaxEvents $MaxEvents -ErrorAction $errorAction | ForEach-Object {
+    [pscustomobject]@{
+        TimeCreated = $_.TimeCreated.ToString('o')
+        Id = $_.Id
+        LevelDisplayName = $_.LevelDisplayName
+        ProviderName = $_.ProviderName
+        Message = $_.Message
+    } | ConvertTo-Json -Compress
+}
+"""
+
+# PowerShell also ends a single-quoted string at the typographic single quotes, so
+# each of them is doubled just like the ASCII apostrophe
+SINGLE_QUOTE_RE = re.compile("['\u2018\u2019\u201a\u201b]")
+
+# Encoded once at import time; each call only appends parameter literals
+WINUPDATE_SCRIPT_B64 = base64.b64encode(WINUPDATE_SCRIPT.encode('utf-16-le')).decode('ascii')
+EVENTLOG_SCRIPT_B64 = base64.b64encode(EVENTLOG_SCRIPT.encode('utf-16-le')).decode('ascii')
+
+
+def ps_literal(value: Any) -> str:
+    """Render a Python value as a PowerShell literal."""
+    if value is None:
+        return "$null"
+    if isinstance(value, bool):
+        return "$true" if value else "$false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "".join(["@(", ",".join([ps_literal(item) for item in value]), ")"])
+    return "'" + SINGLE_QUOTE_RE.sub(r"\g<0>\g<0>", str(value)) + "'"
+
+
+def script_invocation(encoded_script: str) -> str:
+    """Build the expression that decodes and invokes a Base64-encoded script block."""
+    return (
+        "& ([ScriptBlock]::Create([Text.Encoding]::Unicode.GetString("
+        f"[Convert]::FromBase64String('{encoded_script}'))))"
+    )
+
+
+# Invocation prefixes are computed once; calls only append parameter literals
+WINUPDATE_INVOKE = script_invocation(WINUPDATE_SCRIPT_B64)
+EVENTLOG_INVOKE = script_invocation(EVENTLOG_SCRIPT_B64)
+
+
+def invoke_script(invocation: str, **params: Any) -> str:
+    """Append bound parameters to a script block invocation."""
+    arguments = "".join(
+        f" -{name} {ps_literal(value)}"
+        for name, value in params.items()
+        if value is not None and value != [] and value != ""
+    )
+    return invocation + arguments
+
+
+@functools.lru_cache(maxsize=32)
+def build_windows_update_log_command(output_path: str = "C:\\temp\\WindowsUpdate.log") -> str:
+    """Build the script that generates and tails the Windows Update log."""
+    return invoke_script(WINUPDATE_INVOKE, OutputPath=output_path)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_event_log_command(log_name: str, max_events: int, event_ids: Tuple[int, ...],
+                             source_filter: Optional[str]) -> str:
+    """Build and memoize the Get-WinEvent invocation for hashable arguments."""
+    if not event_ids and not source_filter:
+        # Common case: no filters, so only the two fixed parameters are bound
+        return f"{EVENTLOG_INVOKE} -LogName {ps_literal(log_name)} -MaxEvents {max_events}"
+    
+    # Assemble the filtered invocation in a single join
+    parts = [EVENTLOG_INVOKE, " -LogName ", ps_literal(log_name), " -MaxEvents ", str(max_events)]
+    if event_ids:
+        parts += [" -EventIds @(", ",".join([str(event_id) for event_id in event_ids]), ")"]
+    if source_filter:
+        parts += [" -SourceFilter ", ps_literal(source_filter)]
+    return "".join(parts)
+
+
+def build_event_log_command(log_name: str = "System", max_events: int = 100,
+                            event_ids: Optional[List[int]] = None,
+                            source_filter: Optional[str] = None) -> str:
+    """Build the Get-WinEvent query for an event log."""
+    return _build_event_log_command(
+        log_name,
+        int(max_events),
+        tuple(int(event_id) for event_id in event_ids) if event_ids else (),
+        source_filter or None
+    )
+
+
+def build_batch_item_command(item: Dict[str, Any]) -> str:
+    """Build the script for a single batch item ({"tool": ..., "arguments": {...}})."""
+    tool = item.get("tool", "execute_powershell")
+    arguments = item.get("arguments", {})
+    
+    if tool == "execute_powershell":
+        return arguments["command"]
+    elif tool == "get_windows_update_log":
+        return build_windows_update_log_command(
+            arguments.get("output_path", "C:\\temp\\WindowsUpdate.log")
+        )
+    elif tool == "get_event_log":
+        return build_event_log_command(
+            log_name=arguments.get("log_name", "System"),
+            max_events=arguments.get("max_events", 100),
+            event_ids=arguments.get("event_ids"),
+            source_filter=arguments.get("source_filter")
+        )
+    else:
+        raise ValueError(f"Unknown batch tool: {tool}")
@@ -0,0 +1,61 @@
+"""
+Short-lived cache of PowerShell command results shared by the PowerShell MCP servers.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Commands whose output changes from one call to the next are never cached
+VOLATILE_COMMAND_RE = re.compile(r"Get-Date|\[DateTime\]::(Now|UtcNow|Today)", re.IGNORECASE)
+
+CacheKey = Tuple[str, str, bytes, bytes]
+
+
+class CommandResultCache:
+    """Small LRU cache of command results that expire after a fixed TTL."""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-process salt, so the password digests in the keys can't be looked up offline
+        self._salt = os.urandom(16)
+    
+    def make_key(self, hostname: str, username: str, password: str, command: str) -> CacheKey:
+        """Build the cache key for a command run on a host with a given set of credentials.
+        
+        The password is part of the key so that a call with wrong credentials never
+        receives a result cached for a session that authenticated successfully.
+        """
+        credentials = hashlib.blake2b(password.encode('utf-8'), digest_size=16, salt=self._salt).digest()
+        digest = hashlib.blake2b(command.encode('utf-8'), digest_size=16).digest()
+        return (hostname, username, credentials, digest)
+    
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return dict(result)
+    
+    def put(self, key: CacheKey, result: Dict[str, Any]):
+        """Store a result, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
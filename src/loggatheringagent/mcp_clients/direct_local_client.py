@@ -2,16 +2,134 @@
 Direct local client for Windows log gathering - bypasses MCP for localhost testing.
 """
 
+import asyncio
+import base64
+import functools
 import os
+import re
 import stat as os_stat
 import subprocess
 import json
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
+from ..core.local_files import LOCAL_HOSTS, directory_columns, open_log, read_tail, scan_directory, to_local
+from ..core.powershell_scripts import build_batch_item_command, build_event_log_command, build_windows_update_log_command
+
 logger = logging.getLogger(__name__)
 
+# Windows caps a command line at 32767 characters; longer scripts fall back to -Command
+MAX_ENCODED_COMMAND = 30000
+
+
+@functools.lru_cache(maxsize=64)
+def _encode_command(command: str) -> str:
+    """Base64-encode a script for -EncodedCommand, once per distinct script."""
+    return base64.b64encode(command.encode('utf-16-le')).decode('ascii')
+
+
+def _read_tail(local_path: str, lines: int) -> Tuple[str, int, int]:
+    """Read the last N lines of a file, returning (content, lines_read, file_size)."""
+    with open_log(local_path) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        tail_bytes = read_tail(f, lines)
+    
+    lines_read = tail_bytes.count(b"\n")
+    if tail_bytes and not tail_bytes.endswith(b"\n"):
+        lines_read += 1
+    
+    content = tail_bytes.decode('utf-8', errors='replace').replace("\r\n", "\n")
+    return content, lines_read, file_size
+
+
+# Seconds allowed per batched item; the batch timeout grows with the number of items
+BATCH_ITEM_TIMEOUT = 30
+
+# Get-WindowsUpdateLog decodes ETL traces and routinely runs well past the default timeout,
+# so it gets its own invocation and a longer limit
+WINDOWS_UPDATE_LOG_TIMEOUT = 300
+
+# Sentinel written before each item's output in a batched script
+BATCH_MARKER = "<<<LGA-BATCH"
+BATCH_MARKER_RE = re.compile(r"^<<<LGA-BATCH (\d+) (OK|ERR)>>>\r?$", re.MULTILINE)
+
+
+def build_batch_script(commands: List[str]) -> str:
+    """Concatenate several scripts into one invocation with delimited outputs.
+    
+    Each item runs with $ErrorActionPreference = 'Stop' in its own scope, and an item that
+    still leaves records in $Error or a non-zero $LASTEXITCODE is reported as failed with
+    those errors, so failures stay attached to the item that caused them.
+    """
+    parts = []
+    for index, command in enumerate(commands):
+        parts.append(f"""
+$Error.Clear()
+$global:LASTEXITCODE = 0
+try {{
+    $lgaOutput = & {{
+        $ErrorActionPreference = 'Stop'
+{command}
+    }} | Out-String
+    if ($Error.Count -or $LASTEXITCODE) {{
+        Write-Output '{BATCH_MARKER} {index} ERR>>>'
+        if ($LASTEXITCODE) {{ Write-Output "Exited with code $LASTEXITCODE" }}
+        $Error | ForEach-Object {{ $_.ToString() }}
+    }} else {{
+        Write-Output '{BATCH_MARKER} {index} OK>>>'
+        Write-Output $lgaOutput
+    }}
+}} catch {{
+    Write-Output '{BATCH_MARKER} {index} ERR>>>'
+    Write-Output $_.Exception.Message
+}}
+""")
+    return "".join(parts)
+
+
+def split_batch_output(result: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+    """Split the output of a batched script back into per-item results."""
+    stdout = result["stdout"] or ""
+    markers = list(BATCH_MARKER_RE.finditer(stdout))
+    
+    if not markers:
+        # The batch never got to run its items - report the failure for each
+        return [dict(result) for _ in range(count)]
+    
+    item_results: List[Optional[Dict[str, Any]]] = [None] * count
+    for position, marker in enumerate(markers):
+        index = int(marker.group(1))
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(stdout)
+        output = stdout[marker.end():end].strip("\r\n")
+        
+        if index >= count:
+            continue
+        if marker.group(2) == "OK":
+            item_results[index] = {
+                "status_code": 0,
+                "stdout": output,
+                "stderr": "",
+                "success": True
+            }
+        else:
+            item_results[index] = {
+                "status_code": 1,
+                "stdout": "",
+                "stderr": output,
+                "success": False
+            }
+    
+    return [
+        item_result if item_result is not None else {
+            "status_code": -1,
+            "stdout": "",
+            "stderr": result["stderr"] or "No output returned for batch item",
+            "success": False
+        }
+        for item_result in item_results
+    ]
+
 
 class DirectLocalClient:
     """Direct client that handles both SMB and PowerShell operations locally."""
@@ -35,16 +153,14 @@ class DirectLocalClient:
         """Read the last N lines of a file locally."""
         try:
             # For localhost testing, convert path format to local Windows path
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert C$/path format to C:\\path
-                if file_path.startswith("C$/"):
-                    local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    clean_path = file_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(file_path)
                 
-                # Read the file locally
-                if not os.path.exists(local_path):
+                # Read off the event loop so concurrent reads actually overlap; opening the
+                # file doubles as the existence check
+                try:
+                    content, lines_read, file_size = await asyncio.to_thread(_read_tail, local_path, lines)
+                except FileNotFoundError:
                     return {
                         "success": False,
                         "error": f"File not found: {local_path}",
@@ -52,16 +168,11 @@ class DirectLocalClient:
                         "file_path": file_path
                     }
                 
-                with open(local_path, 'r', encoding='utf-8', errors='replace') as f:
-                    all_lines = f.readlines()
-                    tail_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                    content = ''.join(tail_lines)
-                
                 return {
                     "success": True,
                     "content": content,
-                    "lines_read": len(tail_lines),
-                    "total_lines": len(all_lines),
+                    "lines_read": lines_read,
+                    "file_size": file_size,
                     "file_path": file_path
                 }
             else:
@@ -83,54 +194,32 @@ class DirectLocalClient:
     
     async def list_directory(self, hostname: str, username: str, password: str,
                            dir_path: str, domain: Optional[str] = None) -> Dict[str, Any]:
-        """List contents of a directory locally."""
+        """List contents of a directory locally, in the same columns as the SMB server."""
         try:
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert to local path
-                if dir_path.startswith("C$/"):
-                    local_path = dir_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    clean_path = dir_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(dir_path)
                 
-                if not os.path.exists(local_path):
+                # Stat off the event loop, like read_file_tail
+                try:
+                    columns = await asyncio.to_thread(scan_directory, local_path)
+                except FileNotFoundError:
                     return {
                         "success": False,
                         "error": f"Directory not found: {local_path}",
-                        "files": [],
+                        **directory_columns([]),
                         "directory": dir_path
                     }
                 
-                files = []
-                for item in os.listdir(local_path):
-                    try:
-                        item_path = os.path.join(local_path, item)
-                        file_stat = os.stat(item_path)
-                        files.append({
-                            "name": item,
-                            "size": file_stat.st_size,
-                            "modified": file_stat.st_mtime,
-                            "is_dir": os_stat.S_ISDIR(file_stat.st_mode)
-                        })
-                    except Exception as e:
-                        logger.warning(f"Failed to stat {item}: {e}")
-                        files.append({
-                            "name": item,
-                            "size": 0,
-                            "modified": 0,
-                            "is_dir": False
-                        })
-                
                 return {
                     "success": True,
-                    "files": files,
+                    **columns,
                     "directory": dir_path
                 }
             else:
                 return {
                     "success": False,
                     "error": "Remote access not supported in test mode",
-                    "files": [],
+                    **directory_columns([]),
                     "directory": dir_path
                 }
             
@@ -139,7 +228,7 @@ class DirectLocalClient:
             return {
                 "success": False,
                 "error": str(e),
-                "files": [],
+                **directory_columns([]),
                 "directory": dir_path
             }
     
@@ -147,13 +236,8 @@ class DirectLocalClient:
                               file_path: str, domain: Optional[str] = None) -> Dict[str, Any]:
         """Check if a file exists locally."""
         try:
-            if hostname in ['localhost', '127.0.0.1']:
-                # Convert to local path
-                if file_path.startswith("C$/"):
-                    local_path = file_path.replace("C$/", "C:\\").replace("/", "\\")
-                else:
-                    clean_path = file_path.replace('/', '\\')
-                    local_path = f"C:\\{clean_path}"
+            if hostname in LOCAL_HOSTS:
+                local_path = to_local(file_path)
                 
                 if os.path.exists(local_path):
                     file_stat = os.stat(local_path)
@@ -189,7 +273,8 @@ class DirectLocalClient:
     
     # PowerShell Functions
     async def execute_powershell(self, hostname: str, username: str, password: str,
-                                command: str, transport: str = "ntlm") -> Dict[str, Any]:
+                                command: str, transport: str = "ntlm",
+                                timeout: float = 30) -> Dict[str, Any]:
         """Execute a PowerShell command locally."""
         try:
             # For localhost testing, execute locally
@@ -199,11 +284,20 @@ class DirectLocalClient:
                 env['PYTHONIOENCODING'] = 'utf-8'
                 env['POWERSHELL_TELEMETRY_OPTOUT'] = '1'
                 
-                result = subprocess.run(
-                    ["powershell", "-OutputFormat", "Text", "-NonInteractive", "-Command", command],
+                # Repeated static scripts reuse their cached encoding
+                encoded = _encode_command(command)
+                if len(encoded) <= MAX_ENCODED_COMMAND:
+                    command_args = ["-EncodedCommand", encoded]
+                else:
+                    command_args = ["-Command", command]
+                
+                # Run in a worker thread so concurrent commands don't block the event loop
+                result = await asyncio.to_thread(
+                    subprocess.run,
+                    ["powershell", "-OutputFormat", "Text", "-NonInteractive", *command_args],
                     capture_output=True,
                     text=True,
-                    timeout=30,
+                    timeout=timeout,
                     env=env,
                     encoding='utf-8',
                     errors='replace'
@@ -235,23 +329,10 @@ class DirectLocalClient:
     async def get_windows_update_log(self, hostname: str, username: str, password: str,
                                    output_path: str = "C:\\temp\\WindowsUpdate.log") -> Dict[str, Any]:
         """Get Windows Update log locally."""
-        command = f'''
-        # Create temp directory if it doesn't exist
-        New-Item -ItemType Directory -Path C:\\temp -Force | Out-Null
-        
-        # Generate Windows Update log
-        Get-WindowsUpdateLog -LogPath "{output_path}"
-        
-        # Read and return the last 1000 lines
-        if (Test-Path "{output_path}") {{
-            $content = Get-Content "{output_path}" -Tail 1000
-            $content -join "`n"
-        }} else {{
-            "Failed to generate Windows Update log"
-        }}
-        '''
+        command = build_windows_update_log_command(output_path)
         
-        return await self.execute_powershell(hostname, username, password, command)
+        return await self.execute_powershell(hostname, username, password, command,
+                                             timeout=WINDOWS_UPDATE_LOG_TIMEOUT)
     
     async def get_event_log(self, hostname: str, username: str, password: str,
                           log_name: str = "System", max_events: int = 100,
@@ -259,20 +340,52 @@ class DirectLocalClient:
                           source_filter: Optional[str] = None) -> Dict[str, Any]:
         """Query Windows Event Log locally."""
         # Build the PowerShell command
-        command = f"Get-WinEvent -LogName {log_name} -MaxEvents {max_events}"
+        command = build_event_log_command(log_name, max_events, event_ids, source_filter)
         
-        filters = []
-        if event_ids:
-            event_id_list = ",".join(map(str, event_ids))
-            filters.append(f"$_.Id -in @({event_id_list})")
+        return await self.execute_powershell(hostname, username, password, command)
+    
+    async def batch_execute(self, hostname: str, username: str, password: str,
+                            items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run several tool requests locally, batching all but Windows Update log requests into one invocation."""
+        try:
+            commands = [build_batch_item_command(item) for item in items]
+        except (KeyError, ValueError) as e:
+            return [
+                {
+                    "status_code": -1,
+                    "stdout": "",
+                    "stderr": f"Invalid batch item: {e}",
+                    "success": False
+                }
+                for _ in items
+            ]
         
-        if source_filter:
-            filters.append(f"$_.ProviderName -like '{source_filter}'")
+        # Windows Update log items run on their own, so their long runtime can't time out the batch
+        slow = [index for index, item in enumerate(items) if item.get("tool") == "get_windows_update_log"]
+        fast = [index for index, item in enumerate(items) if item.get("tool") != "get_windows_update_log"]
         
-        if filters:
-            filter_string = " -and ".join(filters)
-            command += f" | Where-Object {{{filter_string}}}"
+        async def run_fast() -> List[Dict[str, Any]]:
+            if not fast:
+                return []
+            result = await self.execute_powershell(
+                hostname, username, password,
+                build_batch_script([commands[index] for index in fast]),
+                timeout=BATCH_ITEM_TIMEOUT * len(fast)
+            )
+            return split_batch_output(result, len(fast))
         
-        command += " | Select-Object TimeCreated, Id, LevelDisplayName, ProviderName, Message | ConvertTo-Json -Depth 3"
+        slow_results, fast_results = await asyncio.gather(
+            asyncio.gather(*(
+                self.execute_powershell(hostname, username, password, commands[index],
+                                        timeout=WINDOWS_UPDATE_LOG_TIMEOUT)
+                for index in slow
+            )),
+            run_fast()
+        )
         
-        return await self.execute_powershell(hostname, username, password, command)
\ No newline at end of file
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for index, result in zip(slow, slow_results):
+            results[index] = result
+        for index, result in zip(fast, fast_results):
+            results[index] = result
+        return results
@@ -13,6 +13,15 @@ from mcp.client.stdio import StdioServerParameters, stdio_client
 logger = logging.getLogger(__name__)
 
 
+def parse_command_result(content: List[Any]) -> Dict[str, Any]:
+    """Rebuild a command result from a JSON header part and a raw stdout part."""
+    result = json.loads(content[0].text)
+    if len(content) > 1:
+        result["stdout"] = content[1].text
+    result.setdefault("stdout", "")
+    return result
+
+
 class PowerShellMCPClient:
     """Client for interacting with the PowerShell MCP server."""
     
@@ -88,7 +97,7 @@ class PowerShellMCPClient:
             )
             
             if result.content and len(result.content) > 0:
-                return json.loads(result.content[0].text)
+                return parse_command_result(result.content)
             else:
                 return {"success": False, "error": "No content returned"}
                 
@@ -119,7 +128,7 @@ class PowerShellMCPClient:
             )
             
             if result.content and len(result.content) > 0:
-                return json.loads(result.content[0].text)
+                return parse_command_result(result.content)
             else:
                 return {"success": False, "error": "No content returned"}
                 
@@ -157,7 +166,7 @@ class PowerShellMCPClient:
             result = await self.client_session.call_tool("get_event_log", args)
             
             if result.content and len(result.content) > 0:
-                return json.loads(result.content[0].text)
+                return parse_command_result(result.content)
             else:
                 return {"success": False, "error": "No content returned"}
                 
@@ -168,4 +177,39 @@ class PowerShellMCPClient:
                 "error": str(e),
                 "stdout": "",
                 "stderr": str(e)
-            }
\ No newline at end of file
+            }
+    
+    async def batch_execute(self, hostname: str, username: str, password: str,
+                            items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run several tool requests on a remote machine in a single PowerShell invocation."""
+        if not self.client_session:
+            raise RuntimeError("Client session not initialized. Use as async context manager.")
+        
+        try:
+            result = await self.client_session.call_tool(
+                "batch_execute",
+                {
+                    "hostname": hostname,
+                    "username": username,
+                    "password": password,
+                    "items": items
+                }
+            )
+            
+            if result.content and len(result.content) == len(items):
+                return [json.loads(content.text) for content in result.content]
+            else:
+                error = result.content[0].text if result.content else "No content returned"
+                return [{"success": False, "error": error, "stdout": "", "stderr": error} for _ in items]
+                
+        except Exception as e:
+            logger.error(f"Error executing PowerShell batch: {e}")
+            return [
+                {
+                    "success": False,
+                    "error": str(e),
+                    "stdout": "",
+                    "stderr": str(e)
+                }
+                for _ in items
+            ]
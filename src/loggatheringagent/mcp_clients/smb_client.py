@@ -2,6 +2,7 @@
 SMB MCP client for remote file access.
 """
 
+import base64
 import json
 import logging
 import asyncio
@@ -12,6 +13,18 @@ from mcp.client.stdio import StdioServerParameters, stdio_client
 logger = logging.getLogger(__name__)
 
 
+def parse_file_tail_result(content: List[Any]) -> Dict[str, Any]:
+    """Rebuild a file tail result from a JSON header part and a raw content part."""
+    result = json.loads(content[0].text)
+    if len(content) > 1:
+        text = content[1].text
+        if result.pop("encoding", None) == "base64":
+            text = base64.b64decode(text).decode('utf-8', errors='replace')
+        result["content"] = text
+    result.setdefault("content", "")
+    return result
+
+
 class SMBMCPClient:
     """Client for interacting with the SMB MCP server."""
     
@@ -90,7 +103,7 @@ class SMBMCPClient:
             result = await self.client_session.call_tool("read_file_tail", args)
             
             if result.content and len(result.content) > 0:
-                return json.loads(result.content[0].text)
+                return parse_file_tail_result(result.content)
             else:
                 return {"success": False, "error": "No content returned"}
                 
@@ -132,7 +145,10 @@ class SMBMCPClient:
             return {
                 "success": False,
                 "error": str(e),
-                "files": [],
+                "names": [],
+                "sizes": [],
+                "mtimes": [],
+                "is_dir": [],
                 "directory": dir_path
             }
     
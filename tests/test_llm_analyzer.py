@@ -0,0 +1,48 @@
+"""Tests for LLM response parsing in the log analyzer."""
+
+import json
+
+import pytest
+
+from loggatheringagent.core.llm_analyzer import WindowsLogAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    # Parsing doesn't touch settings or the HTTP client, so skip __init__
+    return WindowsLogAnalyzer.__new__(WindowsLogAnalyzer)
+
+
+def test_repairs_path_with_trailing_backslash(analyzer):
+    raw = r'{"analysis": "Log at C:\Windows\Logs\", "severity": "error"}'
+    
+    parsed = json.loads(analyzer._preprocess_json_string(raw))
+    
+    assert parsed == {"analysis": "Log at C:\\Windows\\Logs\\", "severity": "error"}
+
+
+def test_repair_keeps_escaped_quotes(analyzer):
+    raw = r'{"analysis": "Failed in C:\Temp: \"access denied\"", "severity": "warning"}'
+    
+    parsed = json.loads(analyzer._preprocess_json_string(raw))
+    
+    assert parsed["analysis"] == 'Failed in C:\\Temp: "access denied"'
+
+
+def test_parse_llm_response_with_trailing_backslash_path(analyzer):
+    response = r'{"analysis": "See C:\Windows\Logs\CBS\", "issues_found": ["CBS error"], "severity": "error"}'
+    
+    result = analyzer._parse_llm_response(response, "CBS.log")
+    
+    assert result.analysis == "See C:\\Windows\\Logs\\CBS\\"
+    assert result.issues_found == ["CBS error"]
+    assert result.severity == "error"
+
+
+def test_parse_llm_response_accepts_json_only_stdlib_parses(analyzer):
+    response = '{"analysis": "Disk check", "issues_found": [], "severity": "info", "confidence": NaN}'
+    
+    result = analyzer._parse_llm_response(response, "System")
+    
+    assert result.analysis == "Disk check"
+    assert result.severity == "info"